@@ -0,0 +1,172 @@
+"""
+Read-through cache for catalog reads (Redis db 2).
+
+Every cached entry is tagged: `product:<id>`, `category:<name>`,
+`business:<id>`, plus the collection tags `catalog`, `categories` and
+`bestselling`. A tag is a Redis set of the keys that depend on it, so a write
+invalidates exactly the entries built from the rows it touched.
+
+Invalidating a tag also bumps its watermark (the time of the last write that
+touched it), which the conditional GET helpers use as a cheap version stamp.
+Watermarks are plain keys expiring after WATERMARK_TTL_SECONDS without a write,
+so tags of deleted products/users don't pile up.
+
+Redis is an optimisation only: any Redis error falls through to the loader.
+"""
+import json
+import time
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Iterable, Optional
+from redis.exceptions import RedisError
+from eApp.config import CONFIG
+from eApp.redis_setup import redis_cache, redis_cache_sync
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "cache:"
+TAG_PREFIX = "tag:"
+WATERMARK_PREFIX = "watermark:"  # watermark:<tag> -> epoch ms of the last write
+
+
+def cache_key(namespace: str, **params) -> str:
+    """Stable key for a namespace + query parameters"""
+    signature = json.dumps(params, sort_keys=True, default=str, separators=(",", ":"))
+    digest = hashlib.sha1(signature.encode()).hexdigest()[:20]
+    return f"{KEY_PREFIX}{namespace}:{digest}"
+
+
+def product_tags(product_id: Optional[int] = None, categories: Iterable[Optional[str]] = (), business_id: Optional[int] = None) -> list:
+    """Every tag a product write can affect"""
+    tags = ["catalog", "categories"]
+    if product_id is not None:
+        tags.append(f"product:{product_id}")
+    tags.extend(f"category:{category}" for category in set(categories) if category is not None)
+    if business_id is not None:
+        tags.append(f"business:{business_id}")
+    return tags
+
+
+async def cached(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    tags: Iterable[str] = (),
+    tags_from_value: Optional[Callable[[Any], Iterable[str]]] = None,
+    ttl: int = None,
+    replica: bool = False,
+) -> Any:
+    """
+    Return the cached JSON value for `key`, or run `loader` and cache its result.
+    Args:
+        key: from cache_key()
+        loader: coroutine factory producing a JSON-serialisable value
+        tags: tags known before loading
+        tags_from_value: extra tags derived from the loaded value (e.g. product ids on a page)
+        ttl: seconds, defaults to CONFIG.CACHE_TTL_SECONDS
+        replica: the loader read from a replica (database.on_replica); its result is
+            served but not cached while one of its tags was written within
+            REPLICA_READ_YOUR_WRITES_SECONDS, since the replica may not have that write yet
+    """
+    if not CONFIG.CACHE_ENABLED:
+        return await loader()
+    try:
+        raw = await redis_cache.get(key)
+        if raw is not None:
+            return json.loads(raw)
+    except RedisError as e:
+        logger.warning(f"cache read failed for {key}: {e}")
+        return await loader()
+
+    value = await loader()
+    all_tags = list(tags)
+    if tags_from_value:
+        all_tags.extend(tags_from_value(value))
+    ttl = ttl or CONFIG.CACHE_TTL_SECONDS
+    try:
+        if replica and await _written_within(all_tags, CONFIG.REPLICA_READ_YOUR_WRITES_SECONDS):
+            return value
+        pipe = redis_cache.pipeline(transaction=False)
+        pipe.set(key, json.dumps(value, default=str), ex=ttl)
+        for tag in all_tags:
+            pipe.sadd(f"{TAG_PREFIX}{tag}", key)
+            # a tag set never needs to outlive the entries it points to
+            pipe.expire(f"{TAG_PREFIX}{tag}", ttl)
+        await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"cache write failed for {key}: {e}")
+    return value
+
+
+async def invalidate_tags(*tags: str) -> None:
+    """Drop every entry carrying one of `tags` (call after the write is committed)"""
+    if not tags:
+        return
+    tag_keys = [f"{TAG_PREFIX}{tag}" for tag in tags]
+    try:
+        keys = await redis_cache.sunion(tag_keys)
+        pipe = redis_cache.pipeline(transaction=False)
+        if keys:
+            pipe.delete(*keys)
+        pipe.delete(*tag_keys)
+        _stamp_watermarks(pipe, tags)
+        await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"cache invalidation failed for {tags}: {e}")
+
+
+def invalidate_tags_sync(*tags: str) -> None:
+    """invalidate_tags() for celery tasks"""
+    if not tags:
+        return
+    tag_keys = [f"{TAG_PREFIX}{tag}" for tag in tags]
+    try:
+        keys = redis_cache_sync.sunion(tag_keys)
+        pipe = redis_cache_sync.pipeline(transaction=False)
+        if keys:
+            pipe.delete(*keys)
+        pipe.delete(*tag_keys)
+        _stamp_watermarks(pipe, tags)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"cache invalidation failed for {tags}: {e}")
+
+
+async def _written_within(tags: list, seconds: float) -> bool:
+    """True if any of `tags` was invalidated in the last `seconds`"""
+    if not tags:
+        return False
+    stamps = await redis_cache.mget([f"{WATERMARK_PREFIX}{tag}" for tag in tags])
+    since_ms = (time.time() - seconds) * 1000
+    return any(stamp is not None and int(stamp) >= since_ms for stamp in stamps)
+
+
+def _stamp_watermarks(pipe, tags: Iterable[str]) -> None:
+    now_ms = int(time.time() * 1000)
+    for tag in tags:
+        pipe.set(f"{WATERMARK_PREFIX}{tag}", now_ms, ex=CONFIG.WATERMARK_TTL_SECONDS)
+
+
+async def tag_watermark(tags: Iterable[str]) -> Optional[int]:
+    """
+    Epoch ms of the latest write touching any of `tags`, None if Redis is unavailable.
+    Tags without a watermark (never written, or expired) are stamped with "now"
+    so the version stays stable from then on.
+    """
+    tags = list(tags)
+    if not tags:
+        return None
+    keys = [f"{WATERMARK_PREFIX}{tag}" for tag in tags]
+    try:
+        stamps = await redis_cache.mget(keys)
+        missing = [key for key, stamp in zip(keys, stamps) if stamp is None]
+        if missing:
+            pipe = redis_cache.pipeline(transaction=False)
+            for key in missing:
+                pipe.set(key, int(time.time() * 1000), nx=True, ex=CONFIG.WATERMARK_TTL_SECONDS)
+            await pipe.execute()
+            stamps = await redis_cache.mget(keys)
+        return max(int(stamp) for stamp in stamps if stamp is not None)
+    except (RedisError, ValueError) as e:
+        logger.warning(f"watermark read failed for {tags}: {e}")
+        return None
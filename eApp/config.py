@@ -10,7 +10,49 @@ class Settings(BaseSettings):
     # FastAPI Configuration
     SECRET_KEY: str = ""
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 200
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15  # Access tokens are trusted without a DB lookup for this long
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14  # Single use, rotated by /token/refresh
+    VERIFICATION_TOKEN_EXPIRE_HOURS: int = 48  # Lifetime of the link in the verification email
+    LOGIN_RATE_WINDOW_SECONDS: int = 300  # Sliding window for /token attempts
+    LOGIN_RATE_LIMIT_PER_IP: int = 50  # Attempts per window from one client IP
+    LOGIN_RATE_LIMIT_PER_EMAIL: int = 10  # Attempts per window against one account
+    HASH_POOL_WORKERS: int = 2  # Processes that run argon2 hash/verify off the event loop
+    HASH_POOL_MAX_PENDING: int = 32  # Requests allowed to wait for a worker before answering 503
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0  # get_current_user serves a known token from memory this long
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000  # LRU bound on cached tokens per process
+    IMAGE_UPLOAD_MAX_BYTES: int = 20 * 1024 * 1024  # Uploads past this are rejected with 413 mid-stream
+    UPLOAD_CHUNK_BYTES: int = 256 * 1024  # Uploads are read and written in chunks of this size
+    IMAGE_POOL_WORKERS: int = 2  # Processes that decode/resize uploaded images off the event loop
+    IMAGE_POOL_MAX_PENDING: int = 16  # Uploads allowed to wait for a worker before answering 503
+    PRODUCT_IMAGE_MAX_SIDE: int = 1600  # Product pictures are scaled down to fit this box
+    
+    # Catalog Configuration
+    PRODUCT_PAGE_SIZE: int = 20  # Default page size for product listings
+    PRODUCT_PAGE_SIZE_MAX: int = 100  # Upper bound a client may request
+    BEST_SELLING_FEED_SIZE: int = 500  # Products kept in the precomputed ranking
+    BEST_SELLING_POOL_SIZE: int = 50  # Top ranked ids that "shuffle" samples from
+    BEST_SELLING_REFRESH_SECONDS: float = 300.0  # Beat interval for the ranking job
+    BULK_IMPORT_MAX_ROWS: int = 10000  # Rows accepted by /upload/products/bulk per request
+    BULK_IMPORT_BATCH_SIZE: int = 1000  # Rows per COPY into staging
+    BULK_IMPORT_MAX_LINE_BYTES: int = 64 * 1024  # Longest line (or multi-line CSV record) accepted by the bulk upload
+    BATCH_UPDATE_MAX_ITEMS: int = 500  # Items accepted by /update/products/batch
+    MULTI_GET_MAX_IDS: int = 300  # Ids accepted by the /get/products multi-get
+    PRICE_FACET_EDGES: list[float] = [50, 100, 250, 500, 1000]  # Price bucket boundaries for facets
+    DISCOUNT_FACET_EDGES: list[int] = [10, 25, 50]  # Discount (%) bucket boundaries for facets
+    CART_TTL_SECONDS: int = 7 * 24 * 3600  # Idle carts fall out of redis, postgres keeps them
+    CART_MAX_QTY: int = 99  # Per product quantity cap
+    CART_FLUSH_INTERVAL_SECONDS: float = 10.0  # Beat interval for the cart write-behind flusher
+    CART_FLUSH_BATCH_SIZE: int = 500  # Dirty carts written per flusher run
+    STATE_BATCH_MAX_OPS: int = 200  # Operations accepted by /cart/batch and /favourites/batch
+    OFFER_SWEEP_BATCH_SIZE: int = 500  # Expired offers cleared per sweeper transaction
+    OFFER_SWEEP_INTERVAL_SECONDS: float = 900.0  # Beat interval for the offer sweeper
+    OUTBOX_DRAIN_INTERVAL_SECONDS: float = 5.0  # Beat interval for the email outbox drainer
+    OUTBOX_BATCH_SIZE: int = 50  # Mails sent per SMTP session
+    OUTBOX_MAX_ATTEMPTS: int = 8  # A mail is marked failed after this many attempts
+    OUTBOX_BACKOFF_BASE_SECONDS: int = 30  # Retry delay doubles from here on every failed attempt
+    OUTBOX_BACKOFF_MAX_SECONDS: int = 3600  # Upper bound on the retry delay
+    OUTBOX_LEASE_SECONDS: int = 600  # A claimed mail is re-claimable after this; must exceed the celery task_time_limit
+    OUTBOX_MAX_BATCHES_PER_RUN: int = 5  # Batches one drain task sends before leaving the rest to the next beat
     
     # Database Configuration
     DATABASE_URL: str = ""  # Async URL (postgresql+asyncpg)
@@ -20,6 +62,11 @@ class Settings(BaseSettings):
     DB_HOST: str 
     DATABASE: str 
     DB_PORT: int 
+    # Optional streaming replica: read-only routes use it when DB_REPLICA_HOST is set
+    DB_REPLICA_HOST: str = ""
+    DB_REPLICA_PORT: int = 5432
+    DATABASE_REPLICA_URL: str = ""  # Async URL, built from the fields above
+    REPLICA_READ_YOUR_WRITES_SECONDS: int = 5  # Reads stay on the primary this long after a client's write
     
     # Redis Configuration
     REDIS_HOST:str = "localhost"
@@ -28,9 +75,14 @@ class Settings(BaseSettings):
     REDIS_DB_CELERY: int = 0  # For payment celery tasks
     REDIS_DB_LLM: int = 1  # For LLM celery tasks
     REDIS_DB_CACHE: int = 2  # For cache
+    REDIS_DB_STATE: int = 3  # For per-user cart/favourite state (write-behind to postgres)
     REDIS_DB_LLM_URL: str = ""
     REDIS_URL: str = ""  # For payment celery (db 0)
     REDIS_CACHE_URL: str = ""  # For cache (db 2)
+    REDIS_STATE_URL: str = ""  # For user state (db 3)
+    CACHE_ENABLED: bool = True  # Read-through cache for catalog routes
+    CACHE_TTL_SECONDS: int = 60  # Upper bound on staleness if an invalidation is missed
+    WATERMARK_TTL_SECONDS: int = 7 * 24 * 3600  # Tag watermarks (ETag versions) of tags not written for this long are dropped
     
     
     #Mail Configuration:
@@ -40,6 +92,9 @@ class Settings(BaseSettings):
     MAIL_PORT: int 
     MAIL_SERVER: str 
     MAIL_FROM_NAME : str 
+    SMTP_POOL_SIZE: int = 2  # Logged-in SMTP sessions kept per celery worker process
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100  # Reconnect after this many mails (servers cap it)
+    SMTP_MAX_IDLE_SECONDS: float = 60.0  # Idle sessions older than this are replaced, not reused
     
     model_config = SettingsConfigDict(env_file="eApp/.env", extra="ignore")
 
@@ -49,10 +104,16 @@ CONFIG.DATABASE_URL = (
     f"postgresql+asyncpg://{CONFIG.DB_ROLE_NAME}:{CONFIG.DB_PASSWORD}"
     f"@{CONFIG.DB_HOST}:{CONFIG.DB_PORT}/{CONFIG.DATABASE}"
 )
+if CONFIG.DB_REPLICA_HOST:
+    CONFIG.DATABASE_REPLICA_URL = (
+        f"postgresql+asyncpg://{CONFIG.DB_ROLE_NAME}:{CONFIG.DB_PASSWORD}"
+        f"@{CONFIG.DB_REPLICA_HOST}:{CONFIG.DB_REPLICA_PORT}/{CONFIG.DATABASE}"
+    )
 CONFIG.DATABASE_URL_CELERY_TASK = (
     f"postgresql://{CONFIG.DB_ROLE_NAME}:{CONFIG.DB_PASSWORD}@{CONFIG.DB_HOST}:{CONFIG.DB_PORT}/{CONFIG.DATABASE}"
 )
 CONFIG.REDIS_URL = f"redis://{CONFIG.REDIS_HOST}:{CONFIG.REDIS_PORT}/{CONFIG.REDIS_DB_CELERY}"
 CONFIG.REDIS_CACHE_URL = f"redis://{CONFIG.REDIS_HOST}:{CONFIG.REDIS_PORT}/{CONFIG.REDIS_DB_CACHE}"
+CONFIG.REDIS_STATE_URL = f"redis://{CONFIG.REDIS_HOST}:{CONFIG.REDIS_PORT}/{CONFIG.REDIS_DB_STATE}"
 CONFIG.REDIS_DB_LLM_URL = f"redis://{CONFIG.REDIS_HOST}:{CONFIG.REDIS_PORT}/{CONFIG.REDIS_DB_LLM}"
 
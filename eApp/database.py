@@ -1,6 +1,10 @@
-from fastapi import Depends
+import time
+import jwt
+from fastapi import Depends, Request
+from redis.exceptions import RedisError
 from eApp.config import CONFIG
-from typing import AsyncGenerator, Annotated
+from eApp.redis_setup import redis_state
+from typing import AsyncGenerator, Annotated, Optional
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 
@@ -27,6 +31,27 @@ asyncSession = async_sessionmaker(
     autoflush=False,
 )
 
+# Read replica: falls back to the primary engine when no replica is configured
+if CONFIG.DATABASE_REPLICA_URL:
+    async_read_engine = create_async_engine(
+        url=CONFIG.DATABASE_REPLICA_URL,
+        pool_size=20,
+        max_overflow=10,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        echo=False
+    )
+else:
+    async_read_engine = async_engine
+
+asyncReadSession = async_sessionmaker(
+    bind=async_read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+)
+
 Base = declarative_base()
 
 
@@ -41,3 +66,115 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 
 #create db dependency
 db_dependency = Annotated[AsyncSession,Depends(get_db)]
+
+
+
+#---------------------------- Read Replica Routing ----------------------------
+# Replica lag guard: after a successful write the client's reads go to the primary
+# for REPLICA_READ_YOUR_WRITES_SECONDS, so it always sees its own writes even if
+# the replica is a few seconds behind. Bearer-token callers (mobile, chat) are
+# tracked by user id in redis (`last_write:<user_id>`); anonymous callers, and any
+# write whose marker could not be stored, get a short-lived cookie instead.
+READ_AFTER_WRITE_COOKIE = "eapp_last_write"
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def last_write_key(user_id) -> str:
+    return f"last_write:{user_id}"
+
+
+def _bearer_user_id(authorization: Optional[str]):
+    """User id of a valid bearer token in the Authorization header, else None"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, CONFIG.SECRET_KEY, algorithms=CONFIG.ALGORITHM).get("id")
+    except jwt.InvalidTokenError:
+        return None
+
+
+def _recent_cookie(request: Request) -> bool:
+    last_write = request.cookies.get(READ_AFTER_WRITE_COOKIE)
+    if not last_write:
+        return False
+    try:
+        return time.time() - float(last_write) < CONFIG.REPLICA_READ_YOUR_WRITES_SECONDS
+    except ValueError:
+        return False
+
+
+async def _recent_writer(request: Request) -> bool:
+    if async_read_engine is async_engine:
+        return False
+    if _recent_cookie(request):
+        return True
+    user_id = _bearer_user_id(request.headers.get("authorization"))
+    if user_id is None:
+        return False
+    try:
+        return bool(await redis_state.exists(last_write_key(user_id)))
+    except RedisError as e:
+        # can't tell: the primary is always fresh
+        print(f"couldn't read the last write marker of user {user_id}: {e}")
+        return True
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only routes: replica, or primary right after this client wrote"""
+    session_factory = asyncSession if await _recent_writer(request) else asyncReadSession
+    async with session_factory() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+def on_replica(session: AsyncSession) -> bool:
+    """True when `session` reads from a replica that may lag behind the primary"""
+    return async_read_engine is not async_engine and session.bind is async_read_engine
+
+
+#create read db dependency
+read_db_dependency = Annotated[AsyncSession,Depends(get_read_db)]
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware recording successful writes: the caller's last_write:<user_id>
+    marker, or READ_AFTER_WRITE_COOKIE on the response when there is no user
+    (or redis is unavailable).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS or async_read_engine is async_engine:
+            await self.app(scope, receive, send)
+            return
+
+        user_id = _bearer_user_id(dict(scope["headers"]).get(b"authorization", b"").decode("latin-1"))
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and not await _mark_writer(user_id):
+                cookie = (
+                    f"{READ_AFTER_WRITE_COOKIE}={time.time():.3f}; Max-Age={CONFIG.REPLICA_READ_YOUR_WRITES_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+async def _mark_writer(user_id) -> bool:
+    """Store the user's last write marker; False when the cookie has to do instead"""
+    if user_id is None:
+        return False
+    try:
+        await redis_state.set(last_write_key(user_id), 1, ex=CONFIG.REPLICA_READ_YOUR_WRITES_SECONDS)
+        return True
+    except RedisError as e:
+        print(f"couldn't store the last write marker of user {user_id}: {e}")
+        return False
@@ -0,0 +1,187 @@
+"""
+Shared helpers for the product catalog routes:
+keyset cursors, listing filters and product serialization.
+"""
+import json
+import base64
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, List, Optional
+from sqlalchemy import Integer, String, any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, Query, status
+from eApp import models, schemas
+from eApp.schemas import INT32_MIN, INT32_MAX
+
+
+#--------------------------------- Keyset Cursor ---------------------------------
+# The cursor is the sort key of the last row of a page, so the next page starts
+# with an index seek instead of an OFFSET scan over every previous row.
+
+def encode_cursor(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def cursor_int(value) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or not INT32_MIN <= value <= INT32_MAX:
+        raise ValueError("expected an integer")
+    return value
+
+
+def cursor_decimal(value) -> Decimal:
+    if not isinstance(value, str):
+        raise ValueError("expected a decimal string")
+    number = Decimal(value)
+    if not number.is_finite():
+        raise ValueError("expected a finite decimal")
+    return number
+
+
+def decode_cursor(cursor: str, **fields) -> dict:
+    """
+    Decode a cursor from encode_cursor(). Every keyword names a field the cursor
+    must carry and the converter checking it (cursor_int, cursor_decimal);
+    a tampered or malformed cursor is a 400, never a KeyError/500.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, dict):
+            raise ValueError("cursor must be an object")
+        for name, convert in fields.items():
+            payload[name] = convert(payload[name])
+        return payload
+    except (ValueError, TypeError, KeyError, ArithmeticError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+
+#--------------------------------- Listing Filters ---------------------------------
+
+def product_filters(
+    category: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    min_discount: Optional[int] = Query(None, ge=0, le=100),
+    max_discount: Optional[int] = Query(None, ge=0, le=100),
+    active_offers: bool = Query(False),
+) -> schemas.ProductFilters:
+    return schemas.ProductFilters(
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        min_discount=min_discount,
+        max_discount=max_discount,
+        active_offers=active_offers,
+    )
+
+
+def filter_conditions(filters: schemas.ProductFilters) -> list:
+    """Translate the listing filters into WHERE clauses on models.Product"""
+    conditions = []
+    if filters.category is not None:
+        conditions.append(models.Product.category == filters.category)
+    if filters.min_price is not None:
+        conditions.append(models.Product.new_price >= filters.min_price)
+    if filters.max_price is not None:
+        conditions.append(models.Product.new_price <= filters.max_price)
+    if filters.min_discount is not None:
+        conditions.append(models.Product.percentage_discount >= filters.min_discount)
+    if filters.max_discount is not None:
+        conditions.append(models.Product.percentage_discount <= filters.max_discount)
+    if filters.active_offers:
+        # served by idx_product_active_offer; the comparison also hides offers
+        # that expired since the last sweep
+        conditions.append(models.Product.offer_expiration_date.isnot(None))
+        conditions.append(models.Product.offer_expiration_date >= func.current_date())
+    return conditions
+
+
+#--------------------------------- Serialization ---------------------------------
+
+def discount_percent(original_price, new_price) -> Optional[int]:
+    """
+    Whole percent off original_price, truncated toward zero. Same rule as the SQL
+    used by the batch price update (bulk_product._discount); None without a price.
+    """
+    original, new = Decimal(str(original_price or 0)), Decimal(str(new_price or 0))
+    if not original:
+        return None
+    return int((original - new) / original * 100)
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def product_document(product: models.Product) -> dict:
+    """JSON-ready representation of a product row"""
+    return {
+        "id": product.id,
+        "name": product.name,
+        "category": product.category,
+        "original_price": _plain(product.original_price),
+        "new_price": _plain(product.new_price),
+        "percentage_discount": product.percentage_discount,
+        "offer_expiration_date": _plain(product.offer_expiration_date),
+        "product_details": product.product_details,
+        "product_image": product.product_image,
+        "is_favourite": product.is_favourite,
+        "add_to_cart": product.add_to_cart,
+        "business_id": product.business_id,
+        "chatbot_product_id": product.chatbot_product_id,
+    }
+
+
+#--------------------------------- Multi-Get ---------------------------------
+
+def parse_id_list(values: Iterable[str]) -> List[str]:
+    """Accept ids=1,2,3 as well as ids=1&ids=2; keeps first-seen order, drops duplicates"""
+    seen = {}
+    for value in values:
+        for part in value.split(","):
+            part = part.strip()
+            if part:
+                seen.setdefault(part, None)
+    return list(seen)
+
+
+def parse_int_ids(values: Iterable[str]) -> List[int]:
+    """
+    parse_id_list() for integer ids.
+    Raises:
+        ValueError: an id is not an integer or is outside the int4 range of products.id
+    """
+    ids = [int(value) for value in parse_id_list(values)]
+    if any(not INT32_MIN <= product_id <= INT32_MAX for product_id in ids):
+        raise ValueError("id out of range")
+    return ids
+
+
+async def fetch_products_by_ids(db: AsyncSession, ids: List[int]) -> dict:
+    """{id: Product} for every existing id, one `WHERE id = ANY(:ids)` round trip"""
+    # an id outside int4 can't exist, and asyncpg would reject the whole array
+    ids = [product_id for product_id in ids if INT32_MIN <= product_id <= INT32_MAX]
+    if not ids:
+        return {}
+    result = await db.execute(
+        select(models.Product).where(models.Product.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+    )
+    return {product.id: product for product in result.scalars().all()}
+
+
+async def fetch_products_by_chatbot_ids(db: AsyncSession, chatbot_ids: List[str]) -> dict:
+    """{chatbot_product_id: Product}, same single query shape as fetch_products_by_ids"""
+    if not chatbot_ids:
+        return {}
+    result = await db.execute(
+        select(models.Product).where(
+            models.Product.chatbot_product_id == any_(bindparam("chatbot_ids", list(chatbot_ids), type_=ARRAY(String)))
+        )
+    )
+    return {product.chatbot_product_id: product for product in result.scalars().all()}
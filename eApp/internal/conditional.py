@@ -0,0 +1,64 @@
+"""
+Conditional GET support (ETag / Last-Modified) for polled read routes.
+
+The version stamp is the cache tag watermark (see eApp.cache.tag_watermark),
+one Redis round trip, so a 304 is answered before any row is loaded.
+A body read from a replica is only stamped once the last write to its tags is
+older than REPLICA_READ_YOUR_WRITES_SECONDS: before that the replica may still
+serve the previous version, and an ETag naming the new one would pin the client
+to that stale copy until the next write.
+"""
+import time
+import hashlib
+from typing import Iterable, Optional
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request, Response, status
+from eApp.config import CONFIG
+from eApp.cache import tag_watermark
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # weak comparison: W/"x" and "x" are the same representation for our purposes
+    bare = etag.removeprefix("W/")
+    return "*" in candidates or any(candidate.removeprefix("W/") == bare for candidate in candidates)
+
+
+async def not_modified(request: Request, response: Response, tags: Iterable[str], replica: bool = False) -> Optional[Response]:
+    """
+    Stamp `response` with ETag/Last-Modified for the data behind `tags`.
+    Returns a 304 response when the client copy is current, otherwise None.
+    `replica`: the body will be loaded from a replica (database.on_replica).
+    """
+    tags = sorted(tags)
+    stamp = await tag_watermark(tags)
+    if stamp is None:
+        return None
+    if replica and stamp >= (time.time() - CONFIG.REPLICA_READ_YOUR_WRITES_SECONDS) * 1000:
+        return None
+
+    query = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    version = f"{request.url.path}?{query}|{','.join(tags)}|{stamp}"
+    etag = f'W/"{hashlib.sha1(version.encode()).hexdigest()[:20]}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stamp / 1000, usegmt=True),
+        "Cache-Control": "no-cache",  # may store, must revalidate
+    }
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return None
+        if stamp // 1000 <= since:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
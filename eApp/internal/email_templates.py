@@ -0,0 +1,43 @@
+"""
+Email bodies, rendered from eApp/templates/email with one Jinja2 environment per
+process. Templates are compiled on first use and kept (auto_reload is off), and
+fragments without variables (styles, footers) are rendered once and reused.
+Used by the API (verification mail) and the celery workers (expiry mails).
+"""
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Optional
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates" / "email"
+
+environment = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+    cache_size=-1,
+)
+
+
+@lru_cache(maxsize=None)
+def fragment(name: str) -> Markup:
+    """A static fragment from templates/email/fragments, rendered once per process"""
+    return Markup(environment.get_template(f"fragments/{name}").render())
+
+
+environment.globals["fragment"] = fragment
+
+
+def render(template_name: str, **context) -> str:
+    return environment.get_template(template_name).render(**context)
+
+
+def render_many(template_name: str, contexts: Iterable[dict], shared: Optional[dict] = None) -> List[str]:
+    """
+    One personalised body per context, for batch sends: the template is looked up
+    once and `shared` values are merged into every context.
+    """
+    template = environment.get_template(template_name)
+    shared = shared or {}
+    return [template.render({**shared, **context}) for context in contexts]
@@ -0,0 +1,15 @@
+"""
+Password hashing primitives. Kept free of app imports: the hash pool's worker
+processes import this module and nothing else.
+"""
+from pwdlib import PasswordHash
+
+password_hash = PasswordHash.recommended()
+
+
+def hash_password(password: str) -> str:
+    return password_hash.hash(password)
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    return password_hash.verify(plain_password, hashed_password)
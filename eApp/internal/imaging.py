@@ -0,0 +1,53 @@
+"""
+Pillow jobs for the image process pool. Kept free of app imports: the pool's
+worker processes import this module and nothing else.
+"""
+import os
+from contextlib import contextmanager
+from PIL import Image, UnidentifiedImageError
+
+# refuse decompression bombs instead of allocating them
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+
+class InvalidImage(ValueError):
+    """The upload is not a decodable image (a client error, unlike failures writing the result)"""
+
+
+@contextmanager
+def _decoded(source: str):
+    """Open and fully decode `source`; decode failures become InvalidImage"""
+    try:
+        image = Image.open(source)
+    except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError) as e:
+        raise InvalidImage(str(e))
+    with image:
+        try:
+            image.load()
+        except (Image.DecompressionBombError, SyntaxError, OSError) as e:
+            # truncated or corrupt pixel data
+            raise InvalidImage(str(e))
+        yield image
+
+
+def _save(image: Image.Image, source: str, destination: str, image_format: str) -> None:
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.save(destination, format=image_format)
+    if source != destination:
+        os.remove(source)
+
+
+def resize_image(source: str, destination: str, width: int, height: int) -> None:
+    """Decode `source`, resize to exactly width x height, write `destination`"""
+    with _decoded(source) as image:
+        image_format = image.format
+        _save(image.resize(size=(width, height)), source, destination, image_format)
+
+
+def shrink_image(source: str, destination: str, max_side: int) -> None:
+    """Decode `source` and write it to `destination`, scaled down (never up) to fit max_side"""
+    with _decoded(source) as image:
+        image_format = image.format
+        image.thumbnail((max_side, max_side))
+        _save(image, source, destination, image_format)
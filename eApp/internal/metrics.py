@@ -0,0 +1,66 @@
+"""
+In-process metrics: counters, gauges and latency summaries kept in memory and
+served as JSON by /metrics. Every uvicorn worker keeps its own registry.
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict
+
+# upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class LatencySummary:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_seconds": self.total / self.count if self.count else 0.0,
+            "max_seconds": self.max,
+            "buckets": {
+                **{f"le_{bound}": hits for bound, hits in zip(LATENCY_BUCKETS, self.buckets)},
+                "inf": self.buckets[-1],
+            },
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._latencies: Dict[str, LatencySummary] = {}
+
+    def inc(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        """Register a gauge; `read` is called on every snapshot"""
+        self._gauges[name] = read
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(name, LatencySummary()).observe(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": {name: read() for name, read in self._gauges.items()},
+                "latencies": {name: summary.snapshot() for name, summary in self._latencies.items()},
+            }
+
+
+REGISTRY = MetricsRegistry()
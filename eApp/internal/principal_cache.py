@@ -0,0 +1,193 @@
+"""
+Principal cache for get_current_user: token -> (decoded claims, user snapshot).
+An in-process TTL+LRU keyed by the sha256 of the bearer token, so a request with a
+known token costs no JWT decode and no users query. Entries never outlive the
+token's own `exp`.
+When a user's role, paid status or verification changes, the writer publishes the
+user id on PRINCIPAL_CHANNEL and every app process drops that user's entries;
+logout does the same for a single revoked token.
+"""
+import time
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from eApp.config import CONFIG
+from eApp.internal.metrics import REGISTRY
+
+PRINCIPAL_CHANNEL = "principal:invalidate"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Compact, immutable view of the authenticated user"""
+    id: int
+    username: str
+    email: str
+    is_verified: bool
+    is_active: bool
+    free_count: int
+    paid_status: bool
+    role: str
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_verified=bool(user.is_verified),
+            is_active=bool(user.is_active),
+            free_count=user.free_count,
+            paid_status=bool(user.paid_status),
+            role=user.role,
+        )
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> "Principal":
+        """From the user snapshot carried by an access token"""
+        return cls(
+            id=claims["id"],
+            username=claims["username"],
+            email=claims["email"],
+            is_verified=claims["is_verified"],
+            is_active=claims["is_active"],
+            free_count=claims["free_count"],
+            paid_status=claims["paid_status"],
+            role=claims["role"],
+        )
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class PrincipalCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # token key -> (expires_at, claims, principal); order = recency
+        self._entries: "OrderedDict[str, Tuple[float, dict, Principal]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        REGISTRY.gauge("principal_cache.size", lambda: len(self._entries))
+
+    def get(self, key: str) -> Optional[Tuple[dict, Principal]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            REGISTRY.inc("principal_cache.miss")
+            return None
+        expires_at, claims, principal = entry
+        if expires_at <= time.time():
+            self._drop(key)
+            REGISTRY.inc("principal_cache.miss")
+            return None
+        self._entries.move_to_end(key)
+        REGISTRY.inc("principal_cache.hit")
+        return claims, principal
+
+    def put(self, key: str, claims: dict, principal: Principal) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        if isinstance(claims.get("exp"), (int, float)):
+            expires_at = min(expires_at, claims["exp"])
+        self._drop(key)
+        self._entries[key] = (expires_at, claims, principal)
+        self._by_user.setdefault(principal.id, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        for key in self._by_user.pop(user_id, set()):
+            self._entries.pop(key, None)
+
+    def invalidate_token(self, key: str) -> None:
+        self._drop(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(entry[2].id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[entry[2].id]
+
+
+PRINCIPALS = PrincipalCache(CONFIG.PRINCIPAL_CACHE_MAX_ENTRIES, CONFIG.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+#--------------------------------- Invalidation ---------------------------------
+# Messages on PRINCIPAL_CHANNEL: "user:<id>" drops every entry of a user,
+# "token:<token key>" drops one revoked token.
+
+async def publish_user_changed(user_id: int) -> None:
+    """
+    Call after committing a change to the user's role, paid status or verification.
+    Also stamps user_changed:<id>, so access tokens issued before now stop being
+    trusted for their user snapshot.
+    """
+    from eApp.redis_setup import redis_state
+    from eApp.internal.tokens import user_changed_key
+    PRINCIPALS.invalidate_user(user_id)
+    try:
+        pipe = redis_state.pipeline(transaction=False)
+        pipe.set(user_changed_key(user_id), time.time(), ex=CONFIG.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+        pipe.publish(PRINCIPAL_CHANNEL, f"user:{user_id}")
+        await pipe.execute()
+    except Exception as e:
+        # entries still expire after PRINCIPAL_CACHE_TTL_SECONDS
+        print(f"couldn't publish principal invalidation for user {user_id}: {e}")
+
+
+def publish_user_changed_sync(user_id: int) -> None:
+    """For celery tasks"""
+    from eApp.redis_setup import redis_state_sync
+    from eApp.internal.tokens import user_changed_key
+    try:
+        pipe = redis_state_sync.pipeline(transaction=False)
+        pipe.set(user_changed_key(user_id), time.time(), ex=CONFIG.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+        pipe.publish(PRINCIPAL_CHANNEL, f"user:{user_id}")
+        pipe.execute()
+    except Exception as e:
+        print(f"couldn't publish principal invalidation for user {user_id}: {e}")
+
+
+async def publish_token_revoked(key: str) -> None:
+    from eApp.redis_setup import redis_state
+    PRINCIPALS.invalidate_token(key)
+    await redis_state.publish(PRINCIPAL_CHANNEL, f"token:{key}")
+
+
+async def listen_invalidations() -> None:
+    """
+    Runs for the app lifetime (started in lifespan). After a dropped subscription the
+    whole cache is cleared, since invalidations may have been missed meanwhile.
+    """
+    from eApp.redis_setup import redis_state
+    while True:
+        pubsub = redis_state.pubsub()
+        try:
+            await pubsub.subscribe(PRINCIPAL_CHANNEL)
+            PRINCIPALS.clear()
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                kind, _, value = message["data"].partition(":")
+                if kind == "user":
+                    PRINCIPALS.invalidate_user(int(value))
+                elif kind == "token":
+                    PRINCIPALS.invalidate_token(value)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"principal invalidation listener error: {e}")
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.reset()
+            except Exception:
+                pass
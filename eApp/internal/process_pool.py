@@ -0,0 +1,71 @@
+"""
+Bounded process pool for CPU-bound work (argon2) that would otherwise block the
+event loop. At most `max_workers` calls run at once and at most `max_pending`
+more wait for a worker; anything beyond that is rejected straight away with
+PoolSaturated instead of queueing without limit.
+A worker that dies (OOM kill, segfault) breaks a ProcessPoolExecutor for good:
+the broken executor is dropped and the next call starts a fresh one, so one
+crash fails only the calls in flight.
+"""
+import asyncio
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+from eApp.internal.metrics import REGISTRY
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class BoundedProcessPool:
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._in_flight = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        REGISTRY.gauge(f"{name}.in_flight", lambda: self._in_flight)
+        REGISTRY.gauge(f"{name}.queued", lambda: max(0, self._in_flight - self.max_workers))
+        REGISTRY.gauge(f"{name}.utilisation", lambda: min(self._in_flight, self.max_workers) / self.max_workers)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: never fork a process that holds an event loop and open sockets
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        """
+        Run fn(*args) in a worker process; fn must be a picklable module level function.
+        Raises:
+            PoolSaturated: every worker is busy and the wait queue is full
+            BrokenProcessPool: a worker died while running this call
+        """
+        if self._in_flight >= self.max_workers + self.max_pending:
+            REGISTRY.inc(f"{self.name}.rejected")
+            raise PoolSaturated(self.name)
+        self._in_flight += 1
+        started = time.perf_counter()
+        executor = self._get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            REGISTRY.inc(f"{self.name}.broken")
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            self._in_flight -= 1
+            REGISTRY.observe(f"{self.name}.latency", time.perf_counter() - started)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
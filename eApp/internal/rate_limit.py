@@ -0,0 +1,81 @@
+"""
+Sliding-window login limiter. Each identity (client IP, login email) owns a redis
+sorted set of attempt timestamps; an attempt is allowed only if every identity has
+fewer than its limit inside the last LOGIN_RATE_WINDOW_SECONDS. The check and the
+record happen in one script call, so concurrent attempts cannot overshoot.
+/token consults it before the users query and before argon2.
+"""
+import time
+import hashlib
+from uuid import uuid4
+from typing import Optional
+from eApp.config import CONFIG
+from eApp.redis_setup import redis_state
+from eApp.internal.metrics import REGISTRY
+
+# KEYS: one sorted set per identity. ARGV: now_ms, window_ms, member, then one limit per key.
+# Returns 0 when allowed (and recorded in every window), otherwise
+# {index of the first exhausted key (1-based), milliseconds until it frees up}.
+SLIDING_WINDOW_LUA = """
+local now, window, member = tonumber(ARGV[1]), tonumber(ARGV[2]), ARGV[3]
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= tonumber(ARGV[3 + i]) then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        return {i, tonumber(oldest[2]) + window - now}
+    end
+end
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, member)
+    redis.call('PEXPIRE', key, window)
+end
+return 0
+"""
+sliding_window_script = redis_state.register_script(SLIDING_WINDOW_LUA)
+
+
+def ip_key(ip: str) -> str:
+    return f"login:ip:{ip}"
+
+
+def email_key(email: str) -> str:
+    # hashed: no addresses in redis key names
+    return f"login:email:{hashlib.sha1(email.strip().lower().encode()).hexdigest()}"
+
+
+async def check_login_attempt(ip: str, email: str) -> Optional[int]:
+    """
+    Record a login attempt.
+    Returns:
+        None when allowed, otherwise the seconds to wait (for Retry-After)
+    """
+    try:
+        result = await sliding_window_script(
+            keys=[ip_key(ip), email_key(email)],
+            args=[
+                int(time.time() * 1000),
+                CONFIG.LOGIN_RATE_WINDOW_SECONDS * 1000,
+                uuid4().hex,
+                CONFIG.LOGIN_RATE_LIMIT_PER_IP,
+                CONFIG.LOGIN_RATE_LIMIT_PER_EMAIL,
+            ],
+        )
+    except Exception as e:
+        # fail open: the bounded hash pool still caps the argon2 work
+        REGISTRY.inc("login_limiter.errors")
+        print(f"login limiter unavailable: {e}")
+        return None
+    if result == 0:
+        REGISTRY.inc("login_limiter.allowed")
+        return None
+    exhausted, wait_ms = result
+    REGISTRY.inc("login_limiter.rejected.ip" if exhausted == 1 else "login_limiter.rejected.email")
+    return max(1, -(-int(wait_ms) // 1000))
+
+
+async def reset_login_attempts(email: str) -> None:
+    """After a successful login: typos before it do not count against the account"""
+    try:
+        await redis_state.delete(email_key(email))
+    except Exception:
+        pass
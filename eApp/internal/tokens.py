@@ -0,0 +1,108 @@
+"""
+Access/refresh tokens and the revocation list.
+Access tokens are short lived (ACCESS_TOKEN_EXPIRE_MINUTES) and carry a snapshot of
+the user, so get_current_user trusts them without a users query. Refresh tokens
+(REFRESH_TOKEN_EXPIRE_DAYS) are single use: /token/refresh revokes the one it gets
+and issues a new pair.
+Revocation is one redis key per token id, `revoked:<jti>`, expiring with the token.
+Every token issued from one login shares a family id (`fam`). A refresh token used
+twice means it was stolen: `revoked_family:<fam>` then ends the whole family, the
+thief's and the legitimate client's tokens alike, and the user has to log in again.
+`user_changed:<user_id>` holds when the user was last changed: access tokens issued
+before that carry a stale snapshot, and their user is read from the DB once.
+"""
+import jwt
+from uuid import uuid4
+from typing import Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from eApp.config import CONFIG
+from eApp.redis_setup import redis_state
+
+ACCESS = "access"
+REFRESH = "refresh"
+VERIFY = "verify"
+
+
+def revoked_key(jti: str) -> str:
+    return f"revoked:{jti}"
+
+
+def family_key(family: str) -> str:
+    return f"revoked_family:{family}"
+
+
+def user_changed_key(user_id: int) -> str:
+    return f"user_changed:{user_id}"
+
+
+def _encode(claims: dict, lifetime: timedelta) -> str:
+    now = datetime.now(timezone.utc)
+    claims.update({
+        "jti": uuid4().hex,
+        "iat": int(now.timestamp()),
+        "exp": now + lifetime,
+    })
+    return jwt.encode(claims, CONFIG.SECRET_KEY, algorithm=CONFIG.ALGORITHM)
+
+
+def create_access_token(user, family: Optional[str] = None) -> str:
+    return _encode({
+        "type": ACCESS,
+        "fam": family,
+        "id": user.id,
+        "email": user.email,
+        "username": user.username,
+        "is_verified": bool(user.is_verified),
+        "is_active": bool(user.is_active),
+        "free_count": user.free_count,
+        "paid_status": bool(user.paid_status),
+        "role": user.role,
+    }, timedelta(minutes=CONFIG.ACCESS_TOKEN_EXPIRE_MINUTES))
+
+
+def create_refresh_token(user_id: int, family: Optional[str] = None) -> str:
+    return _encode({"type": REFRESH, "id": user_id, "fam": family}, timedelta(days=CONFIG.REFRESH_TOKEN_EXPIRE_DAYS))
+
+
+def create_verification_token(user) -> str:
+    return _encode({"type": VERIFY, "id": user.id, "username": user.username},
+                   timedelta(hours=CONFIG.VERIFICATION_TOKEN_EXPIRE_HOURS))
+
+
+def token_pair(user, family: Optional[str] = None) -> dict:
+    """A new access/refresh pair; `family` continues a refreshed login, None starts one"""
+    family = family or uuid4().hex
+    return {
+        "access_token": create_access_token(user, family),
+        "refresh_token": create_refresh_token(user.id, family),
+        "token_type": "bearer",
+        "expires_in": CONFIG.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+async def revoke(claims: dict) -> bool:
+    """
+    Put the token on the revocation list until it would have expired anyway.
+    Returns:
+        False if it was already revoked (a refresh token being reused)
+    """
+    ttl = max(1, int(claims["exp"] - datetime.now(timezone.utc).timestamp()))
+    return bool(await redis_state.set(revoked_key(claims["jti"]), 1, ex=ttl, nx=True))
+
+
+async def revoke_family(claims: dict) -> None:
+    """End every token of the login `claims` belongs to (refresh token reuse)"""
+    if claims.get("fam"):
+        await redis_state.set(family_key(claims["fam"]), 1, ex=CONFIG.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600)
+
+
+async def token_state(claims: dict) -> Tuple[bool, Optional[float]]:
+    """(is revoked, token or its family; when the user last changed) in one round trip"""
+    revocation_keys = [revoked_key(claims.get("jti", ""))]
+    if claims.get("fam"):
+        revocation_keys.append(family_key(claims["fam"]))
+    pipe = redis_state.pipeline(transaction=False)
+    pipe.exists(*revocation_keys)
+    pipe.get(user_changed_key(claims["id"]))
+    revoked, changed_at = await pipe.execute()
+    return bool(revoked), float(changed_at) if changed_at is not None else None
@@ -0,0 +1,155 @@
+"""
+Image uploads. UploadLimitMiddleware caps the request body at IMAGE_UPLOAD_MAX_BYTES
+(plus multipart overhead) before the multipart parser spools it. The spooled file
+is then copied to disk in UPLOAD_CHUNK_BYTES chunks (never held in memory as a
+whole), the real type is sniffed from the first bytes instead of trusting the
+file name, and the Pillow decode/resize runs in a bounded process pool so the
+event loop keeps serving other requests.
+"""
+import os
+import secrets
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from eApp.config import CONFIG
+from eApp.internal import imaging
+from eApp.internal.process_pool import BoundedProcessPool, PoolSaturated
+
+IMAGE_DIR = "eApp/static/images"
+UPLOAD_PATHS = ("/uploadfile/profile", "/product/picture/")
+# room for the multipart boundaries and part headers around the image
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# magic bytes -> extension of the stored file
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+)
+
+image_pool = BoundedProcessPool("image", CONFIG.IMAGE_POOL_WORKERS, CONFIG.IMAGE_POOL_MAX_PENDING)
+
+
+def sniff_image(head: bytes) -> Optional[str]:
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def _remove(*paths: str) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _too_large() -> str:
+    return f"Image is larger than {CONFIG.IMAGE_UPLOAD_MAX_BYTES // (1024 * 1024)} MB."
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware capping the body of the image upload routes: a declared
+    Content-Length over the limit is answered 413 without reading the body, and
+    a body that turns out longer (chunked, or a lying header) is cut off with 413
+    as soon as it crosses the limit.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(UPLOAD_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        limit = CONFIG.IMAGE_UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD_BYTES
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": _too_large()}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # raised inside the form parser; FastAPI passes HTTPException through
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=_too_large())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def stream_image_to_disk(file: UploadFile) -> str:
+    """
+    Write the upload to IMAGE_DIR in chunks.
+    Returns:
+        Path of the temporary (.part) file; the caller turns it into the final image
+    Raises:
+        HTTPException 415 for anything that is not a png/jpeg, 413 past the size cap
+    """
+    try:
+        first = await file.read(CONFIG.UPLOAD_CHUNK_BYTES)
+        extension = sniff_image(first)
+        if extension is None:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                                detail="File should be a .png, .jpg or .jpeg image.")
+
+        path = f"{IMAGE_DIR}/{secrets.token_hex(10)}.{extension}.part"
+        written = 0
+        out = await run_in_threadpool(open, path, "wb")
+        try:
+            chunk = first
+            while chunk:
+                written += len(chunk)
+                if written > CONFIG.IMAGE_UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=_too_large())
+                await run_in_threadpool(out.write, chunk)
+                chunk = await file.read(CONFIG.UPLOAD_CHUNK_BYTES)
+        except BaseException:
+            await run_in_threadpool(out.close)
+            await run_in_threadpool(_remove, path)
+            raise
+        await run_in_threadpool(out.close)
+        return path
+    finally:
+        # releases the spooled temp file on every path, rejected uploads included
+        await file.close()
+
+
+async def process_image(part_path: str, job, *args) -> str:
+    """
+    Run a Pillow job from internal/imaging on the streamed file in the image pool.
+    Returns:
+        File name of the stored image (inside IMAGE_DIR)
+    """
+    final_path = part_path[:-len(".part")]
+    try:
+        await image_pool.run(job, part_path, final_path, *args)
+    except BaseException as e:
+        # never leave the upload or a half written result behind
+        await run_in_threadpool(_remove, part_path, final_path)
+        if isinstance(e, imaging.InvalidImage):
+            # sniffed like an image but Pillow could not decode it
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image could not be decoded.")
+        if isinstance(e, (PoolSaturated, BrokenProcessPool)):
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Server is busy. Please try again.",
+                                headers={"Retry-After": "1"})
+        raise
+    return os.path.basename(final_path)
+
+
+async def save_profile_picture(file: UploadFile) -> str:
+    return await process_image(await stream_image_to_disk(file), imaging.resize_image, 200, 200)
+
+
+async def save_product_picture(file: UploadFile) -> str:
+    return await process_image(await stream_image_to_disk(file), imaging.shrink_image, CONFIG.PRODUCT_IMAGE_MAX_SIDE)
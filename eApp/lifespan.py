@@ -1,4 +1,5 @@
 
+import asyncio
 from eApp import models
 from fastapi import FastAPI
 from sqlalchemy.sql import text 
@@ -6,8 +7,12 @@ from psycopg.rows import dict_row
 from contextlib import asynccontextmanager
 from psycopg_pool import AsyncConnectionPool
 from eApp.workflows.workflow import workflow
+from eApp.services import category_summary_service
+from eApp.passHasing import hash_pool
+from eApp.internal.uploads import image_pool
+from eApp.internal import principal_cache
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
-from eApp.database import asyncSession,async_engine,connection_string
+from eApp.database import asyncSession,async_engine,async_read_engine,connection_string
 
 
 #"""
@@ -26,7 +31,15 @@ async def lifespan(app:FastAPI):
         async with async_engine.begin() as conn:
             print("Database connection established")
             await conn.run_sync(fn=models.Base.metadata.create_all)
+            # indexes/columns for tables that already existed before create_all
+            for ddl in models.SCHEMA_PATCHES:
+                await conn.execute(text(ddl))
+            # bring category_summary in line with whatever is already in products
+            await conn.execute(category_summary_service.REBUILD_SQL)
             print("Application startup completed")
+
+        # drops cached principals when another process changes a user
+        principal_listener = asyncio.create_task(principal_cache.listen_invalidations())
             
         #b.Compile the langgraph checkpointer and keep connection alive for app lifetime:
         psycopg_conn_string =  connection_string.replace("+asyncpg","")
@@ -69,10 +82,15 @@ async def lifespan(app:FastAPI):
     # crtl + c 
     # uvicoron stop 
     print("Application shutdown started")
+    principal_listener.cancel()
     try:
         # Pool/connection are closed by the context manager above
         await async_engine.dispose()
+        if async_read_engine is not async_engine:
+            await async_read_engine.dispose()
         print("Database connections closed")
+        hash_pool.shutdown()
+        image_pool.shutdown()
     except Exception as e:
         print(f"Shutdown error: {e}")
     print("Application shutdown completed")
@@ -2,14 +2,18 @@ from eApp import models
 from eApp import lifespan
 from dotenv import dotenv_values
 from sqlalchemy.ext.asyncio import AsyncSession
-from eApp.database import get_db
+from eApp.database import get_db, ReadYourWritesMiddleware
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, status, HTTPException, Request, Query,Depends
 from eApp.passHasing import get_password_hash, very_token,get_current_user
+from eApp.internal.principal_cache import publish_user_changed
+from eApp.internal.uploads import UploadLimitMiddleware
+from eApp.services.cart_service import CartUnavailable
+from fastapi.responses import JSONResponse
 from eApp.routes import curdOperation, login,imageUpload,profile,singup,productImageUpload,categories,bestselling,allUser,update_profile
-from eApp.routes import fetch_cart_product, add_to_cart,remove_from_cart,add_to_favourite,remove_from_favourite
-from eApp.routes import fetch_fav_product, social_media, sse, chatHistory
+from eApp.routes import fetch_cart_product, add_to_cart,remove_from_cart,add_to_favourite,remove_from_favourite, batch_state
+from eApp.routes import fetch_fav_product, social_media, sse, chatHistory, search, bulk_product, facets, metrics
 
 #jinja2Templates -> For showing html in verification.
 template = Jinja2Templates(directory="eApp/templates")
@@ -28,6 +32,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# keeps a client's reads on the primary for a few seconds after it writes
+app.add_middleware(ReadYourWritesMiddleware)
+
+# rejects oversized image uploads before the multipart parser spools them
+app.add_middleware(UploadLimitMiddleware)
+
+
+# redis kept evicting the cart between load and update: transient, ask the client to retry
+@app.exception_handler(CartUnavailable)
+async def cart_unavailable(request: Request, exc: CartUnavailable):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Cart is temporarily unavailable. Please try again."},
+        headers={"Retry-After": "1"},
+    )
+
 
 
 #_________________________________ VERIFICATION ENDPOINT _________________________________
@@ -38,6 +58,7 @@ async def email_verification(request: Request, token: str = Query(...), db: Asyn
     if user and not user.is_verified:
         user.is_verified = True
         await db.commit()
+        await publish_user_changed(user.id)
         return template.TemplateResponse("verification.html", {"request": request, "USER_NAME": user.username})
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -62,10 +83,16 @@ app.include_router(productImageUpload.router)
 #______________ API Router For Uplod Product ____________________________
 app.include_router(curdOperation.router)
 
+app.include_router(bulk_product.router)
+
+app.include_router(facets.router)
+
 app.include_router(categories.router)
 
 app.include_router(bestselling.router)
 
+app.include_router(search.router)
+
 app.include_router(allUser.app)
 
 app.include_router(update_profile.router)
@@ -82,11 +109,16 @@ app.include_router(remove_from_favourite.router)
 
 app.include_router(fetch_fav_product.router)
 
+app.include_router(batch_state.router)
+
 # ==================== Social Media Integration Routes ====================
 app.include_router(social_media.router)
 app.include_router(sse.router)
 app.include_router(chatHistory.router)
 
+# ==================== Operations ====================
+app.include_router(metrics.router)
+
 #
 #tmux new -s worker
 #crl+b then d 
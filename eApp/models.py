@@ -1,7 +1,8 @@
 from eApp.database import Base,db_dependency
-from sqlalchemy.orm import relationship
-from sqlalchemy import Column,Integer,Boolean,ForeignKey,String,Text,Numeric,DateTime,Index
-from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship,deferred
+from sqlalchemy.dialects.postgresql import ARRAY,JSONB,TSVECTOR
+from sqlalchemy import Column,Integer,Boolean,ForeignKey,String,Text,Numeric,DateTime,Date,Index,Computed
+from sqlalchemy.sql import func,text
 from datetime import datetime
 
 class User(Base):
@@ -49,15 +50,33 @@ class Business(Base):
     #one to many relationship with(Product)
     prd = relationship("Product",back_populates="busn_rel")
 
+# Weighted document used by /search/products: name > category > details.
+# Must stay in sync with the ALTER TABLE in SCHEMA_PATCHES.
+PRODUCT_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(product_details, '')), 'C')"
+)
+
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # keyset pagination: (id), (new_price,id) with and without a category filter
+        Index("idx_product_category_id",'category','id'),
+        Index("idx_product_price_id",'new_price','id'),
+        Index("idx_product_category_price_id",'category','new_price','id'),
+        # full text search
+        Index("idx_product_search_vector",'search_vector',postgresql_using="gin"),
+        # only products that still carry an offer: "active offers" filter and the expiry sweeper
+        Index("idx_product_active_offer",'offer_expiration_date',postgresql_where=text("offer_expiration_date IS NOT NULL")),
+    )
     id = Column(Integer,primary_key=True,index=True)
     name = Column(String(100),nullable=False,index=True)
     category = Column(String(30),index=True)
     original_price = Column(Numeric(precision=10,scale=2)) #Column(Float(precision=2))
     new_price = Column(Numeric(precision=10,scale=2))
     percentage_discount = Column(Integer)
-    offer_expiration_date = Column(String(200),nullable=False, default=datetime.utcnow().date())
+    offer_expiration_date = Column(Date,nullable=True)  # NULL: no expiry (never given, or already swept)
     product_details = Column(Text,nullable=False,default="No Product Details Found")
     product_image = Column(String(200),nullable=False,default="productDefault.jpg")
     is_favourite = Column(Boolean,nullable=False,default=False)
@@ -65,10 +84,51 @@ class Product(Base):
     business_id = Column(Integer,ForeignKey('business.id'))
     # For chatbot/social media integration - unique ID for each product
     chatbot_product_id = Column(String(100),nullable=True,unique=True,index=True)
+    # Generated by postgres on every insert/update, deferred so listings never load it
+    search_vector = deferred(Column(TSVECTOR,Computed(PRODUCT_SEARCH_VECTOR,persisted=True)))
 
     #many to one relationship with (Business)
     busn_rel = relationship("Business",back_populates="prd")
 
+class CartItem(Base):
+    """
+    Durable copy of a user's cart. The hot path is the redis hash cart:<user_id>;
+    the `flush_carts` beat task writes it behind into this table.
+    """
+    __tablename__ = "cart_items"
+    user_id = Column(Integer,ForeignKey('users.id',ondelete="CASCADE"),primary_key=True)
+    product_id = Column(Integer,ForeignKey('products.id',ondelete="CASCADE"),primary_key=True,index=True)
+    qty = Column(Integer,nullable=False,default=1)
+    # prices when the product was first added; the cart total is computed from these
+    unit_price = Column(Numeric(precision=10,scale=2),nullable=True)
+    original_price = Column(Numeric(precision=10,scale=2),nullable=True)
+    updated_at = Column(DateTime,default=datetime.utcnow,onupdate=datetime.utcnow)
+
+class Favourite(Base):
+    """Per-user favourites; mirrored in the redis set fav:<user_id> for membership checks"""
+    __tablename__ = "favourites"
+    user_id = Column(Integer,ForeignKey('users.id',ondelete="CASCADE"),primary_key=True)
+    product_id = Column(Integer,ForeignKey('products.id',ondelete="CASCADE"),primary_key=True,index=True)
+    created_at = Column(DateTime,default=datetime.utcnow)
+
+class CategorySummary(Base):
+    """One row per category, kept up to date by the product write paths (CategorySummaryService)"""
+    __tablename__ = "category_summary"
+    category = Column(String(30),primary_key=True)
+    product_image = Column(String(200),nullable=True)
+    product_count = Column(Integer,nullable=False,default=0)
+    min_price = Column(Numeric(precision=10,scale=2),nullable=True)
+    max_price = Column(Numeric(precision=10,scale=2),nullable=True)
+    updated_at = Column(DateTime,default=datetime.utcnow,onupdate=datetime.utcnow)
+
+class ProductRanking(Base):
+    """Precomputed best-selling feed, rebuilt by the `refresh_product_ranking` beat task"""
+    __tablename__ = "product_ranking"
+    product_id = Column(Integer,ForeignKey('products.id',ondelete="CASCADE"),primary_key=True)
+    rank = Column(Integer,nullable=False,unique=True,index=True)  # 1 = best selling
+    score = Column(Numeric(precision=12,scale=4),nullable=False,default=0)
+    refreshed_at = Column(DateTime,default=datetime.utcnow)
+
 class SocialMediaToken(Base):
     __tablename__ = "social_media_tokens"
     id = Column(Integer,primary_key=True,index=True)
@@ -189,3 +249,74 @@ class MessageHistory(Base):
     # Relationship
     conversation = relationship("Conversation", back_populates="messages")
 
+
+
+# ==================== Email Outbox ====================
+
+class EmailOutbox(Base):
+    """
+    Mail written in the same transaction as the change that causes it; the
+    `drain_email_outbox` task delivers it in batches, with retries and backoff.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # the drainer only ever looks at due pending mail and expired 'sending' leases
+        Index("idx_email_outbox_claimable",'next_attempt_at',postgresql_where=text("status IN ('pending', 'sending')")),
+    )
+
+    id = Column(Integer, primary_key=True)
+    recipients = Column(ARRAY(String(200)), nullable=False)
+    subject = Column(String(200), nullable=False)
+    html_body = Column(Text, nullable=True)  # NULL: rendered from template/context at send time
+    template = Column(String(100), nullable=True)
+    context = Column(JSONB, nullable=True)
+    status = Column(String(10), nullable=False, default='pending')  # pending,sending,sent,failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # while 'sending': end of the lease
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+
+# ==================== Schema Patches ====================
+# create_all() only creates missing tables, it never touches a table that already
+# exists. Indexes/columns added to existing tables are listed here as idempotent
+# DDL and applied by the lifespan right after create_all().
+SCHEMA_PATCHES = [
+    "CREATE INDEX IF NOT EXISTS idx_product_category_id ON products (category, id)",
+    "CREATE INDEX IF NOT EXISTS idx_product_price_id ON products (new_price, id)",
+    "CREATE INDEX IF NOT EXISTS idx_product_category_price_id ON products (category, new_price, id)",
+    f"ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({PRODUCT_SEARCH_VECTOR}) STORED",
+    "CREATE INDEX IF NOT EXISTS idx_product_search_vector ON products USING gin (search_vector)",
+    # offer_expiration_date used to be a String(200) that defaulted to the server start
+    # date, so a past legacy value can't be told apart from "no date given". Convert it
+    # in place keeping only future dates (real, still running offers); past, unparsable
+    # or impossible values (2024-13-45) become NULL = no expiry instead of aborting startup.
+    """
+    DO $$
+    BEGIN
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'products' AND column_name = 'offer_expiration_date') <> 'date' THEN
+            CREATE FUNCTION pg_temp.legacy_offer_date(value text) RETURNS date AS $f$
+            BEGIN
+                IF value !~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}' THEN
+                    RETURN NULL;
+                END IF;
+                RETURN substring(value FROM 1 FOR 10)::date;
+            EXCEPTION WHEN others THEN
+                RETURN NULL;
+            END
+            $f$ LANGUAGE plpgsql;
+            ALTER TABLE products ALTER COLUMN offer_expiration_date DROP DEFAULT;
+            ALTER TABLE products ALTER COLUMN offer_expiration_date DROP NOT NULL;
+            ALTER TABLE products ALTER COLUMN offer_expiration_date TYPE date USING (
+                CASE WHEN pg_temp.legacy_offer_date(offer_expiration_date) > current_date
+                     THEN pg_temp.legacy_offer_date(offer_expiration_date)
+                END
+            );
+            DROP FUNCTION pg_temp.legacy_offer_date(text);
+        END IF;
+    END $$
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_product_active_offer ON products (offer_expiration_date) WHERE offer_expiration_date IS NOT NULL",
+]
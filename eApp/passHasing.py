@@ -1,10 +1,15 @@
 import jwt 
+from typing import Optional
+from concurrent.futures.process import BrokenProcessPool
+from redis.exceptions import RedisError
 from eApp import models
-from jose import JWTError
 from fastapi import Depends
 from sqlalchemy import select
 from eApp.config import CONFIG
-from pwdlib import PasswordHash
+from eApp.internal.hashing import hash_password, check_password
+from eApp.internal.process_pool import BoundedProcessPool, PoolSaturated
+from eApp.internal.principal_cache import PRINCIPALS, Principal, token_key
+from eApp.internal.tokens import ACCESS, VERIFY, token_state
 from eApp.database import get_db
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -23,42 +28,42 @@ In this case, it's set to "auto", which means that the CryptContext instance wil
 automatically manage the deprecation of old hashing schemes
 
 '''
-password_hash = PasswordHash.recommended()
-
 def get_password_hash(password):
-    return password_hash.hash(password)
+    return hash_password(password)
 
 def verify_password(plain_password, hashed_password):
-    return password_hash.verify(plain_password, hashed_password)
+    return check_password(plain_password, hashed_password)
+
+
+# argon2 is deliberately slow: request handlers use the async versions, which run it
+# in a bounded process pool and answer 503 when the pool is saturated
+hash_pool = BoundedProcessPool("password_hash", CONFIG.HASH_POOL_WORKERS, CONFIG.HASH_POOL_MAX_PENDING)
+
+async def _run_hash_pool(fn, *args):
+    try:
+        return await hash_pool.run(fn, *args)
+    except (PoolSaturated, BrokenProcessPool):
+        # saturated, or a worker crashed (the pool restarts on the next call)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy. Please try again.",
+            headers={"Retry-After": "1"},
+        )
+
+async def get_password_hash_async(password):
+    return await _run_hash_pool(hash_password, password)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_hash_pool(check_password, plain_password, hashed_password)
 
 '''
 Check-> When we send mail (While Registation Endpoint) we create a token by the help of token_data[username,id] and 
 SECRET Key and Algorithms by the help of jwt.decode() method we decode the token and in 
 payload variable we get -> username,id
 '''
-async def very_token(token: str, db: AsyncSession):
+def decode_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token,CONFIG.SECRET_KEY, algorithms=CONFIG.ALGORITHM)
-        print(f"Decoded payload: {payload}")
-        user_id = payload.get("id")
-        if user_id:
-            result = await db.execute(select(models.User).where(models.User.id == user_id))
-            user = result.scalar_one_or_none()
-            if user:
-                return user
-            else:
-                print(f"User with id {user_id} not found in the database.")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid token: User not found.",
-                    headers={"WWW-Authenticate": "Bearer"}
-                )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token: Missing user ID.",
-                headers={"WWW-Authenticate": "Bearer"}
-            )
+        return jwt.decode(token,CONFIG.SECRET_KEY, algorithms=CONFIG.ALGORITHM)
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -71,6 +76,41 @@ async def very_token(token: str, db: AsyncSession):
             detail="Invalid token.",
             headers={"WWW-Authenticate": "Bearer"}
         )
+
+
+async def load_token_user(payload: dict, db: AsyncSession):
+    user_id = payload.get("id")
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token: Missing user ID.",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    user = result.scalar_one_or_none()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token: User not found.",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return user
+
+
+def _token_error(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+#email verification link: links sent before tokens were typed carry no "type"
+async def very_token(token: str, db: AsyncSession):
+    payload = decode_token(token)
+    if payload.get("type") not in (None, VERIFY):
+        raise _token_error("Invalid token type.")
+    return await load_token_user(payload, db)
     
     
 #oauth2 scheme:
@@ -78,30 +118,56 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
 #get the current user: when a user authorized:
-async def get_current_user(token: str = Depends(oauth2_scheme),db: AsyncSession = Depends(get_db)):
-    print("token: in get current user: "+ token)
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials.Please log in.",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+# Returns a Principal (compact snapshot, not an ORM object). A token seen recently is
+# served from the principal cache: no JWT decode, no redis, no users query.
+# Otherwise one redis round trip checks the revocation list; the user snapshot in
+# the access token is trusted unless the user changed after the token was issued.
+async def get_current_user(token: str = Depends(oauth2_scheme),db: AsyncSession = Depends(get_db)) -> Principal:
+    key = token_key(token)
+    hit = PRINCIPALS.get(key)
+    if hit is not None:
+        return hit[1]
+    payload = decode_token(token)
+    if payload.get("type") != ACCESS or "jti" not in payload:
+        raise _token_error("Invalid token type.")
+    try:
+        revoked, changed_at = await token_state(payload)
+    except RedisError as e:
+        # revocation can't be checked while redis is down: fall back to the users row
+        # (catches deactivated users) and don't cache, so the check resumes with redis
+        print(f"token state unavailable, using the database: {e}")
+        return Principal.from_user(await load_token_user(payload, db))
+    if revoked:
+        raise _token_error("Token has been revoked.")
+    if changed_at is None or changed_at < payload["iat"]:
+        principal = Principal.from_claims(payload)
+    else:
+        principal = Principal.from_user(await load_token_user(payload, db))
+    PRINCIPALS.put(key, payload, principal)
+    return principal
+
+
+#operational routes (metrics): admins only
+async def get_admin_user(user: Principal = Depends(get_current_user)) -> Principal:
+    if user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not Authorized To Perform This Task."
+        )
+    return user
+
+
+#public routes that personalise their output when a token is present:
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+#an expired, revoked or malformed token is treated as anonymous rather than a 401
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme),db: AsyncSession = Depends(get_db)):
+    if not token:
+        return None
     try:
-        user = await very_token(token,db)
-        output = {
-                        "id": user.id,
-                        "username":user.username,
-                        "email": user.email,
-                        "trail_remain": user.free_count,
-                        "paid": user.paid_status,
-                        "role":user.role,
-                        
-                        }
-        print(output)
-        
-        return user
-    except JWTError:
-        raise credentials_exception
-    return id
+        return await get_current_user(token, db)
+    except HTTPException:
+        return None
 
 
 
@@ -19,3 +19,36 @@ redis_async = aioredis.from_url(
     encoding="utf-8"
 )
 
+
+# Redis client for the catalog read-through cache (db 2)
+redis_cache = aioredis.from_url(
+    CONFIG.REDIS_CACHE_URL,
+    password=CONFIG.REDIS_PASSWORD or None,
+    decode_responses=True,
+    encoding="utf-8"
+)
+
+# Sync client on the cache db: used by celery tasks to invalidate cache tags
+redis_cache_sync = redis.Redis(
+    host=CONFIG.REDIS_HOST,
+    port=CONFIG.REDIS_PORT,
+    password=CONFIG.REDIS_PASSWORD or None,
+    db=CONFIG.REDIS_DB_CACHE,
+    decode_responses=True
+)
+
+# Redis clients for per-user state: carts/favourites (db 3)
+redis_state = aioredis.from_url(
+    CONFIG.REDIS_STATE_URL,
+    password=CONFIG.REDIS_PASSWORD or None,
+    decode_responses=True,
+    encoding="utf-8"
+)
+
+redis_state_sync = redis.Redis(
+    host=CONFIG.REDIS_HOST,
+    port=CONFIG.REDIS_PORT,
+    password=CONFIG.REDIS_PASSWORD or None,
+    db=CONFIG.REDIS_DB_STATE,
+    decode_responses=True
+)
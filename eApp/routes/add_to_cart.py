@@ -1,9 +1,13 @@
 
-from eApp import models
+from eApp import models, schemas
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from eApp.config import CONFIG
 from eApp.database import get_db
+from eApp.cache import invalidate_tags
+from eApp.passHasing import get_current_user
+from eApp.services.cart_service import CartService
 
 router = APIRouter(
     tags=["add to cart"]
@@ -11,16 +15,19 @@ router = APIRouter(
 
 
 @router.post('/add/to/cart')
-async def add_to_cart(id: int, db: AsyncSession = Depends(get_db)):
+async def add_to_cart(
+    id: int,
+    qty: int = Query(1, ge=1, le=CONFIG.CART_MAX_QTY),
+    user: schemas.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
     result = await db.execute(select(models.Product).where(models.Product.id == id))
     product = result.scalar_one_or_none()
-    if not product:
+    if product is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found."
         )
-    product.add_to_cart = True
-    db.add(product)
-    await db.commit()
-    await db.refresh(product)
-    return {"detail": "Successfully added to cart list"}
\ No newline at end of file
+    quantity = await CartService.add(db, user.id, product, qty)
+    await invalidate_tags(f"user:{user.id}")
+    return {"detail": "Successfully added to cart list", "quantity": quantity}
@@ -1,9 +1,12 @@
 
-from eApp import models
+from eApp import models, schemas
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends, HTTPException, status
 from eApp.database import get_db
+from eApp.cache import invalidate_tags
+from eApp.passHasing import get_current_user
+from eApp.services.favourite_service import FavouriteService
 
 router = APIRouter(
     tags=["add to favourite list"]
@@ -11,16 +14,13 @@ router = APIRouter(
 
 
 @router.post('/add/to/favourite')
-async def add_to_favourite(id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.Product).where(models.Product.id == id))
-    product = result.scalar_one_or_none()
-    if not product:
+async def add_to_favourite(id: int, user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(models.Product.id).where(models.Product.id == id))
+    if result.scalar_one_or_none() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found."
         )
-    product.is_favourite = True
-    db.add(product)
-    await db.commit()
-    await db.refresh(product)
-    return {"detail": "Successfully added to favourite list"}
\ No newline at end of file
+    await FavouriteService.add(db, user.id, id)
+    await invalidate_tags(f"user:{user.id}")
+    return {"detail": "Successfully added to favourite list"}
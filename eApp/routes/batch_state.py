@@ -0,0 +1,50 @@
+from typing import Dict, List
+from eApp import models, schemas
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, status
+from eApp.database import get_db
+from eApp.cache import invalidate_tags
+from eApp.passHasing import get_current_user
+from eApp.internal.catalog import fetch_products_by_ids
+from eApp.services.cart_service import CartService
+from eApp.services.favourite_service import FavouriteService
+
+router = APIRouter(
+    tags=["batch cart/favourite"]
+)
+
+
+# Replaces one /add|remove/... call per item: the whole list is validated with one
+# query and applied atomically, and the response is the resulting state.
+async def _check_operations(db: AsyncSession, operations: List) -> Dict[int, models.Product]:
+    if not operations:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="operations is empty.")
+    # removing an unknown product is a no-op, adding one fails the whole batch
+    added = list({operation.product_id for operation in operations if operation.op == "add"})
+    found = await fetch_products_by_ids(db, added)
+    missing = [product_id for product_id in added if product_id not in found]
+    if missing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail={"message": "Product not found.", "missing": missing})
+    return found
+
+
+@router.post('/cart/batch')
+async def cart_batch(batch: schemas.CartBatch, user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    products = await _check_operations(db, batch.operations)
+    items = await CartService.apply_batch(db, user.id, batch.operations, products)
+    await invalidate_tags(f"user:{user.id}")
+    return {
+        "cart": [{"product_id": product_id, "quantity": qty} for product_id, qty in items.items()],
+        "summary": await CartService.get_summary(db, user.id),
+    }
+
+
+@router.post('/favourites/batch')
+async def favourites_batch(batch: schemas.FavouriteBatch, user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    await _check_operations(db, batch.operations)
+    favourites = await FavouriteService.apply_batch(db, user.id, batch.operations)
+    await invalidate_tags(f"user:{user.id}")
+    return {
+        "favourites": sorted(favourites),
+    }
@@ -1,43 +1,73 @@
-from eApp import models
-from sqlalchemy import func, select
+from typing import Optional
+from eApp import schemas
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends
-from eApp.database import get_db
+from fastapi import APIRouter, Depends, Query
+from eApp.config import CONFIG
+from eApp.database import get_read_db, on_replica
+from eApp.cache import cache_key, cached
+from eApp.passHasing import get_optional_user
+from eApp.services.favourite_service import FavouriteService
+from eApp.internal.catalog import encode_cursor, decode_cursor, cursor_int
+from eApp.services.best_selling_service import BestSellingService
 
 router = APIRouter(
     tags=['BestSelling']
 )
 
 
+# Served from the precomputed `product_ranking` table (see BestSellingService).
+# `shuffle=true` samples from the small top-ranked pool instead of paging.
 @router.get('/bestSelling')
-async def best_selling(db: AsyncSession = Depends(get_db)):
-    stmt = (
-        select(
-            models.Product.id,
-            models.Product.name,
-            models.Product.product_image,
-            models.Product.new_price,
-            models.Product.percentage_discount,
-            models.Product.offer_expiration_date,
-            models.Product.is_favourite,
-            models.Product.add_to_cart,
-            models.Product.product_details,
-        )
-        .order_by(func.random())
+async def best_selling(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(CONFIG.PRODUCT_PAGE_SIZE, ge=1, le=CONFIG.PRODUCT_PAGE_SIZE_MAX),
+    shuffle: bool = Query(False),
+    user: Optional[schemas.User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    user_id = user.id if user else None
+    if shuffle:
+        # random by design, so never cached
+        page = feed_response(await BestSellingService.get_shuffled(db, limit), None)
+        await FavouriteService.annotate(db, user_id, page["Categories"], favourite_field="favourite", cart_field="cart")
+        return page
+
+    after_rank = 0
+    if cursor:
+        after_rank = decode_cursor(cursor, rank=cursor_int)["rank"]
+
+    async def load_page():
+        # fetch one extra row to know whether there is a next page
+        ranked = await BestSellingService.get_page(db, after_rank, limit + 1)
+        if not ranked and not cursor:
+            return feed_response(await BestSellingService.get_newest(db, limit), None)
+        next_cursor = None
+        if len(ranked) > limit:
+            next_cursor = encode_cursor({"rank": ranked[limit - 1].rank})
+        return feed_response([row[:-1] for row in ranked[:limit]], next_cursor)
+
+    # the page is dropped when the ranking is rebuilt or any product on it changes
+    page = await cached(
+        cache_key("bestselling", after_rank=after_rank, limit=limit),
+        load_page,
+        tags=["bestselling"],
+        tags_from_value=lambda page: [f"product:{item['id']}" for item in page["Categories"]],
+        replica=on_replica(db),
     )
-    result = await db.execute(stmt)
-    all_data = result.all()
-    
+    await FavouriteService.annotate(db, user_id, page["Categories"], favourite_field="favourite", cart_field="cart")
+    return page
+
+
+def feed_response(all_data, next_cursor: Optional[str]) -> dict:
     data_into_list = [{
         "id": id_,
         "name": name,
         "image": image,
-        "newPrice": new_price,
+        "newPrice": float(new_price) if new_price is not None else None,
         "dis": discount,
         "date": date,
         "favourite": is_favourite,
         "cart": add_to_cart,
         "decription": details
     } for id_, name, image, new_price, discount, date, is_favourite, add_to_cart, details in all_data]
-    return {"Categories" : data_into_list}
-
+    return {"Categories" : data_into_list, "next_cursor": next_cursor}
@@ -0,0 +1,295 @@
+import csv
+import json
+import uuid
+from decimal import Decimal
+from typing import AsyncIterator
+from pydantic import ValidationError
+from sqlalchemy import Date, Integer, Numeric, cast, column, func, text, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from eApp import models, schemas
+from eApp.config import CONFIG
+from eApp.database import get_db
+from eApp.passHasing import get_current_user
+from eApp.cache import invalidate_tags, product_tags
+from eApp.internal.catalog import discount_percent
+from eApp.services.category_summary_service import CategorySummaryService
+
+router = APIRouter(tags=["Bulk Product"])
+
+
+STAGING_COLUMNS = [
+    "row_number", "name", "category", "original_price", "new_price", "percentage_discount",
+    "offer_expiration_date", "product_details", "business_id", "chatbot_product_id",
+]
+
+CREATE_STAGING_SQL = text("""
+    CREATE TEMP TABLE product_import_staging (
+        row_number integer,
+        name varchar(100),
+        category varchar(30),
+        original_price numeric(10,2),
+        new_price numeric(10,2),
+        percentage_discount integer,
+        offer_expiration_date date,
+        product_details text,
+        business_id integer,
+        chatbot_product_id varchar(100)
+    ) ON COMMIT DROP
+""")
+
+# product_image/is_favourite/add_to_cart defaults live in the ORM, so they are spelled out here
+INSERT_FROM_STAGING_SQL = text("""
+    INSERT INTO products (name, category, original_price, new_price, percentage_discount,
+                          offer_expiration_date, product_details, product_image,
+                          is_favourite, add_to_cart, business_id, chatbot_product_id)
+    SELECT name, category, original_price, new_price, percentage_discount,
+           offer_expiration_date, product_details, 'productDefault.jpg',
+           false, false, business_id, chatbot_product_id
+    FROM product_import_staging
+    ORDER BY row_number
+    RETURNING category
+""")
+
+
+#------------------------------------- Streaming Parsers -------------------------------------
+
+def _line_too_long() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                         detail=f"Lines are limited to {CONFIG.BULK_IMPORT_MAX_LINE_BYTES} bytes.")
+
+
+async def _lines(request: Request) -> AsyncIterator[str]:
+    """
+    Decode the request body line by line without buffering it whole: only the
+    unfinished last line is kept, and it may not grow past BULK_IMPORT_MAX_LINE_BYTES.
+    """
+    buffer = bytearray()
+    async for chunk in request.stream():
+        # only the new bytes need scanning for a newline
+        start = len(buffer)
+        buffer += chunk
+        begin = 0
+        newline = buffer.find(b"\n", start)
+        while newline != -1:
+            if newline - begin > CONFIG.BULK_IMPORT_MAX_LINE_BYTES:
+                raise _line_too_long()
+            yield buffer[begin:newline].decode("utf-8").rstrip("\r")
+            begin = newline + 1
+            newline = buffer.find(b"\n", begin)
+        del buffer[:begin]
+        if len(buffer) > CONFIG.BULK_IMPORT_MAX_LINE_BYTES:
+            raise _line_too_long()
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+async def _csv_rows(request: Request) -> AsyncIterator[dict]:
+    header = None
+    pending = ""
+    async for line in _lines(request):
+        pending = f"{pending}\n{line}" if pending else line
+        # an unterminated quote would otherwise swallow the rest of the body
+        if len(pending) > CONFIG.BULK_IMPORT_MAX_LINE_BYTES:
+            raise _line_too_long()
+        # an odd number of quotes means a quoted field continues on the next line
+        if pending.count('"') % 2:
+            continue
+        fields = next(csv.reader([pending]))
+        pending = ""
+        if header is None:
+            header = [field.strip() for field in fields]
+            continue
+        if not any(field.strip() for field in fields):
+            continue
+        yield dict(zip(header, fields))
+
+
+async def _ndjson_rows(request: Request) -> AsyncIterator[dict]:
+    async for line in _lines(request):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        # non-object lines are passed through and reported as invalid rows
+        yield row if isinstance(row, dict) else {"__invalid__": line[:100]}
+
+
+def _validate(row: dict) -> schemas.UploadProduct:
+    if "__invalid__" in row:
+        raise ValueError("Row is not a JSON object.")
+    # empty CSV cells fall back to the schema defaults
+    product = schemas.UploadProduct(**{key: value for key, value in row.items() if value not in ("", None)})
+    if product.original_price <= 0:
+        raise ValueError("original_price must be greater than 0.")
+    if product.new_price < 0:
+        raise ValueError("new_price must not be negative.")
+    return product
+
+
+def _errors(exc: Exception) -> list:
+    if isinstance(exc, ValidationError):
+        return [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()]
+    return [str(exc)]
+
+
+#------------------------------------- Bulk Upload -------------------------------------
+# Rows are validated with the schemas.UploadProduct rules while the body streams in
+# (at most BULK_IMPORT_MAX_ROWS are kept), so no connection is held while a slow
+# client uploads. Only then is a transaction opened: the valid rows are COPY'd into
+# a temporary staging table in batches and moved into products with a single
+# INSERT ... SELECT. All valid rows land in one transaction.
+async def _read_rows(rows: AsyncIterator[dict], business_id: int):
+    """(staging records of the valid rows, errors of the invalid ones)"""
+    records = []
+    errors = []
+    row_number = 0
+    async for row in rows:
+        row_number += 1
+        if row_number > CONFIG.BULK_IMPORT_MAX_ROWS:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                detail=f"At most {CONFIG.BULK_IMPORT_MAX_ROWS} rows per request.")
+        try:
+            product = _validate(row)
+        except (ValidationError, ValueError, TypeError) as e:
+            errors.append({"row": row_number, "errors": _errors(e)})
+            continue
+
+        original_price = Decimal(str(product.original_price))
+        new_price = Decimal(str(product.new_price))
+        records.append((
+            row_number,
+            product.name,
+            product.category,
+            original_price,
+            new_price,
+            discount_percent(original_price, new_price),
+            product.offer_expiration_date,
+            product.product_details,
+            business_id,
+            f"PROD-{uuid.uuid4().hex[:12].upper()}",
+        ))
+    return records, errors
+
+
+@router.post("/upload/products/bulk")
+async def bulk_upload_products(request: Request, user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not user.is_verified:
+        return {"status": "First verify your account."}
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        rows = _csv_rows(request)
+    elif content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        rows = _ndjson_rows(request)
+    else:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="Send text/csv or application/x-ndjson.")
+
+    try:
+        records, errors = await _read_rows(rows, user.id)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be UTF-8 encoded.")
+
+    accepted = len(records)
+    categories = set()
+    if accepted:
+        try:
+            await db.execute(CREATE_STAGING_SQL)
+            connection = await db.connection()
+            raw_connection = await connection.get_raw_connection()
+            driver = raw_connection.driver_connection  # asyncpg connection, same transaction
+            for start in range(0, accepted, CONFIG.BULK_IMPORT_BATCH_SIZE):
+                batch = records[start:start + CONFIG.BULK_IMPORT_BATCH_SIZE]
+                await driver.copy_records_to_table("product_import_staging", records=batch, columns=STAGING_COLUMNS)
+
+            result = await db.execute(INSERT_FROM_STAGING_SQL)
+            categories = set(result.scalars().all())
+            await CategorySummaryService.refresh(db, categories)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(f"error while bulk upload: {e}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Bulk upload failed.")
+
+    if accepted:
+        await invalidate_tags(*product_tags(None, categories, user.id))
+    return {
+        "message": "Bulk upload finished.",
+        "inserted": accepted,
+        "failed": len(errors),
+        "errors": errors,
+    }
+
+
+#------------------------------------- Batch Price Update -------------------------------------
+# One set-based UPDATE per request, scoped to the caller's products:
+#   items -> UPDATE products ... FROM (VALUES (id, new_price, offer_expiration_date), ...)
+#   rule  -> UPDATE products ... WHERE category = :category (percent_off of original_price)
+# percentage_discount is recomputed in SQL from the new price, truncated like
+# catalog.discount_percent on the single product paths.
+def _discount(new_price):
+    return cast(func.trunc((models.Product.original_price - new_price) / func.nullif(models.Product.original_price, 0) * 100), Integer)
+
+
+@router.put("/update/products/batch")
+async def batch_update_prices(update_data: schemas.BatchPriceUpdate, user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if update_data.items is not None:
+        if not update_data.items:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="items is empty.")
+        # last entry wins for duplicated ids: UPDATE ... FROM would pick one arbitrarily
+        items = {item.id: item for item in update_data.items}
+        new_prices = values(
+            column("id", Integer),
+            column("new_price", Numeric(10, 2)),
+            column("offer_expiration_date", Date),
+            name="new_prices",
+        ).data([(item.id, Decimal(str(item.new_price)), item.offer_expiration_date) for item in items.values()])
+        stmt = (
+            update(models.Product)
+            .where(models.Product.id == new_prices.c.id, models.Product.business_id == user.id)
+            .values(
+                new_price=new_prices.c.new_price,
+                percentage_discount=_discount(new_prices.c.new_price),
+                offer_expiration_date=func.coalesce(new_prices.c.offer_expiration_date, models.Product.offer_expiration_date),
+            )
+        )
+        requested = set(items)
+    else:
+        rule = update_data.rule
+        new_price = func.round(models.Product.original_price * (100 - Decimal(str(rule.percent_off))) / 100, 2)
+        stmt = (
+            update(models.Product)
+            .where(models.Product.business_id == user.id, models.Product.category == rule.category)
+            .values(
+                new_price=new_price,
+                percentage_discount=_discount(new_price),
+                offer_expiration_date=func.coalesce(rule.offer_expiration_date, models.Product.offer_expiration_date),
+            )
+        )
+        requested = set()
+
+    try:
+        result = await db.execute(
+            stmt.returning(models.Product.id, models.Product.category).execution_options(synchronize_session=False)
+        )
+        updated = result.all()
+        categories = {category for _, category in updated}
+        await CategorySummaryService.refresh(db, categories)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        print(f"error while batch price update: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Batch update failed.")
+
+    updated_ids = [product_id for product_id, _ in updated]
+    if updated_ids:
+        await invalidate_tags(*product_tags(None, categories, user.id), *[f"product:{product_id}" for product_id in updated_ids])
+    return {
+        "message": "Prices Updated Successfully.",
+        "updated": sorted(updated_ids),
+        # ids that do not exist or belong to another business
+        "skipped": sorted(requested - set(updated_ids)),
+    }
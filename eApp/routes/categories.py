@@ -1,27 +1,44 @@
 from eApp import models
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends
-from eApp.database import get_db
+from fastapi import APIRouter, Depends, Request, Response
+from eApp.database import get_read_db, on_replica
+from eApp.cache import cache_key, cached
+from eApp.internal.conditional import not_modified
 
 router = APIRouter(tags=["Categories"])
 
 
+# category_summary is maintained by the product write paths (CategorySummaryService),
+# so this is a single ordered read of one row per category.
 @router.get('/Categories')
-async def get_categories(db: AsyncSession = Depends(get_db)):
-    subquery = (
+async def get_categories(request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
+    unchanged = await not_modified(request, response, ["categories"], replica=on_replica(db))
+    if unchanged:
+        return unchanged
+    return await cached(cache_key("categories"), lambda: load_categories(db), tags=["categories"],
+                        replica=on_replica(db))
+
+
+async def load_categories(db: AsyncSession) -> dict:
+    result = await db.execute(
         select(
-            models.Product.category,
-            func.min(models.Product.product_image).label("product_image"),
-        )
-        .group_by(models.Product.category)
-        .subquery()
+            models.CategorySummary.category,
+            models.CategorySummary.product_image,
+            models.CategorySummary.product_count,
+            models.CategorySummary.min_price,
+            models.CategorySummary.max_price,
+        ).order_by(models.CategorySummary.category)
     )
-
-    result = await db.execute(select(subquery.c.category, subquery.c.product_image))
     unique_categories = result.all()
 
-    category_info = [{"category": category, "image": image} for category, image in unique_categories]
+    category_info = [{
+        "category": category,
+        "image": image,
+        "count": count,
+        "min_price": float(min_price) if min_price is not None else None,
+        "max_price": float(max_price) if max_price is not None else None,
+    } for category, image, count, min_price, max_price in unique_categories]
 
     return {
         "Categories": category_info
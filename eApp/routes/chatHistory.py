@@ -1,25 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from eApp.database import get_db
 from eApp.passHasing import get_current_user
+from eApp.internal.principal_cache import Principal
 from eApp import models
 
 router = APIRouter(tags=["Chat History"])
 
 
 @router.get("/chatHistory")
-async def chat_history(user: str = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    try:
-        user_id = int(user)
-    except (TypeError, ValueError):
-        raise HTTPException(status_code=401, detail="Invalid user context")
-
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
-    user_record = result.scalar_one_or_none()
-    if not user_record:
-        raise HTTPException(status_code=404, detail="User not found")
+async def chat_history(user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # get_current_user already guarantees the user exists
+    user_id = user.id
 
     result = await db.execute(
         select(models.Conversation)
@@ -1,10 +1,18 @@
 import uuid
+from typing import List, Literal, Optional
 from eApp import models, schemas
-from sqlalchemy import select
+from eApp.config import CONFIG
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from eApp.database import get_db
-from eApp.passHasing import get_current_user
-from fastapi import APIRouter, Depends, HTTPException,status
+from eApp.database import get_db, get_read_db, on_replica
+from eApp.passHasing import get_current_user, get_optional_user
+from eApp.internal.catalog import encode_cursor, decode_cursor, cursor_decimal, cursor_int, product_filters, filter_conditions, product_document
+from eApp.internal.catalog import parse_id_list, parse_int_ids, fetch_products_by_ids, fetch_products_by_chatbot_ids, discount_percent
+from eApp.services.category_summary_service import CategorySummaryService
+from eApp.services.favourite_service import FavouriteService
+from eApp.cache import cache_key, cached, invalidate_tags, product_tags
+from eApp.internal.conditional import not_modified
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 
 router = APIRouter(tags=["CRUD->Create,Read,Update,Delete"])
 
@@ -17,13 +25,16 @@ async def add_new_product(product: schemas.UploadProduct,user: schemas.User = De
     if current_user and current_user.is_verified:
         product_data['business_id'] = current_user.id
         new_product = models.Product(**product_data)
-        new_product.percentage_discount = ((new_product.original_price - new_product.new_price) / new_product.original_price) * 100
+        new_product.percentage_discount = discount_percent(new_product.original_price, new_product.new_price)
         
         # Generate unique chatbot_product_id for LLM integration
         new_product.chatbot_product_id = f"PROD-{uuid.uuid4().hex[:12].upper()}"
         db.add(new_product)
+        await db.flush()
+        await CategorySummaryService.product_added(db, new_product.category, new_product.product_image, new_product.new_price)
         await db.commit()
         await db.refresh(new_product)
+        await invalidate_tags(*product_tags(new_product.id, [new_product.category], new_product.business_id))
         return {
             "message": "Product Uploaded Successfully.",
             "product_id": new_product.id,
@@ -34,28 +45,135 @@ async def add_new_product(product: schemas.UploadProduct,user: schemas.User = De
 
 #-----------------------------------Get All the Product information-------------------------------
 
+# Keyset pagination: the cursor carries the sort key of the last row, so every
+# page is an index range scan of `limit` rows no matter how deep the client goes.
+async def load_product_page(db: AsyncSession, cursor: Optional[str], limit: int, sort: str, filters: schemas.ProductFilters) -> dict:
+    stmt = select(models.Product).where(*filter_conditions(filters))
+    if sort == "price":
+        stmt = stmt.where(models.Product.new_price.isnot(None))
+        stmt = stmt.order_by(models.Product.new_price, models.Product.id)
+    else:
+        stmt = stmt.order_by(models.Product.id)
+
+    if cursor:
+        if sort == "price":
+            position = decode_cursor(cursor, id=cursor_int, price=cursor_decimal)
+        else:
+            position = decode_cursor(cursor, id=cursor_int)
+        if position.get("sort") != sort:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+        if sort == "price":
+            stmt = stmt.where(
+                tuple_(models.Product.new_price, models.Product.id) > tuple_(position["price"], position["id"])
+            )
+        else:
+            stmt = stmt.where(models.Product.id > position["id"])
+
+    # fetch one extra row to know whether there is a next page
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = result.scalars().all()
+    page = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        position = {"sort": sort, "id": last.id}
+        if sort == "price":
+            position["price"] = str(last.new_price)
+        next_cursor = encode_cursor(position)
+
+    return {
+        "products": [product_document(product) for product in page],
+        "next_cursor": next_cursor,
+    }
+
+
 @router.get("/get/product")
-async def get_all_product(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.Product))
-    all_product = result.scalars().all()
-    return all_product
+async def get_all_product(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(CONFIG.PRODUCT_PAGE_SIZE, ge=1, le=CONFIG.PRODUCT_PAGE_SIZE_MAX),
+    sort: Literal["id", "price"] = Query("id"),
+    filters: schemas.ProductFilters = Depends(product_filters),
+    user: Optional[schemas.User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # a category-filtered page only depends on that category, every other page on the whole catalog
+    tags = [f"category:{filters.category}"] if filters.category is not None else ["catalog"]
+    user_id = user.id if user else None
+    # favourite/cart flags are per user, so the user's own state is part of the version
+    response.headers["Vary"] = "Authorization"
+    unchanged = await not_modified(request, response, tags + ([f"user:{user_id}"] if user_id else []),
+                                 replica=on_replica(db))
+    if unchanged:
+        unchanged.headers["Vary"] = "Authorization"
+        return unchanged
+    key = cache_key("products", cursor=cursor, limit=limit, sort=sort, **filters.model_dump())
+    page = await cached(key, lambda: load_product_page(db, cursor, limit, sort, filters), tags=tags,
+                        replica=on_replica(db))
+    await FavouriteService.annotate(db, user_id, page["products"])
+    return page
 
 #------------------------------Get A the Product information---------------------------------
 @router.get("/get/single/product/{id}")
-async def get_a_single_product(id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.Product).where(models.Product.id == id))
-    product_with_business = result.scalar_one_or_none()
+async def get_a_single_product(id: int, db: AsyncSession = Depends(get_read_db)):
+    async def load_product():
+        result = await db.execute(select(models.Product).where(models.Product.id == id))
+        product_with_business = result.scalar_one_or_none()
 
-    if product_with_business:
-        return {
-            "Product Information": {
-                "id": product_with_business.id,
-                "name": product_with_business.name,
-            },
+        if product_with_business:
+            return {
+                "Product Information": {
+                    "id": product_with_business.id,
+                    "name": product_with_business.name,
+                },
 
-        }
-    else:
-        raise HTTPException(status_code=404, detail="Product not found")
+            }
+        else:
+            raise HTTPException(status_code=404, detail="Product not found")
+
+    return await cached(cache_key("product", id=id), load_product, tags=[f"product:{id}"],
+                        replica=on_replica(db))
+
+#------------------------------Get Many Products In One Query---------------------------------
+# Replaces N calls to /get/single/product/{id}: products come back in the requested
+# order and ids that do not exist are listed under "missing".
+def _requested_ids(ids: List[str]) -> List[str]:
+    requested = parse_id_list(ids)
+    if not requested:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids is empty.")
+    if len(requested) > CONFIG.MULTI_GET_MAX_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {CONFIG.MULTI_GET_MAX_IDS} ids per request.")
+    return requested
+
+
+@router.get("/get/products")
+async def get_many_products(ids: List[str] = Query(...), user: Optional[schemas.User] = Depends(get_optional_user), db: AsyncSession = Depends(get_read_db)):
+    try:
+        requested = parse_int_ids(_requested_ids(ids))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be integers in the int4 range.")
+    found = await fetch_products_by_ids(db, requested)
+    documents = [product_document(found[product_id]) for product_id in requested if product_id in found]
+    await FavouriteService.annotate(db, user.id if user else None, documents)
+    return {
+        "products": documents,
+        "missing": [product_id for product_id in requested if product_id not in found],
+    }
+
+
+@router.get("/get/products/by-chatbot-id")
+async def get_many_products_by_chatbot_id(ids: List[str] = Query(...), user: Optional[schemas.User] = Depends(get_optional_user), db: AsyncSession = Depends(get_read_db)):
+    requested = _requested_ids(ids)
+    found = await fetch_products_by_chatbot_ids(db, requested)
+    documents = [product_document(found[chatbot_id]) for chatbot_id in requested if chatbot_id in found]
+    await FavouriteService.annotate(db, user.id if user else None, documents)
+    return {
+        "products": documents,
+        "missing": [chatbot_id for chatbot_id in requested if chatbot_id not in found],
+    }
 
 #--------------------------------------Delete A the Product --------------------------
 @router.delete("/delete/product/{id}")
@@ -76,10 +194,16 @@ async def delete_product(id: int, user: schemas.User = Depends(get_current_user)
                 detail="Product not found or not owned by you"
             )
         
+        category = product.category
         await db.delete(product)
+        await db.flush()
+        await CategorySummaryService.refresh(db, [category])
         await db.commit()
+        await invalidate_tags(*product_tags(id, [category], user.id))
         return {"message": "Product deleted successfully"}
     
+    except HTTPException:
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to delete product")
@@ -87,22 +211,24 @@ async def delete_product(id: int, user: schemas.User = Depends(get_current_user)
 #--------------------------------------Update A the Product --------------------------
 @router.put("/update/product/{id}")
 async def update_product(id: int, update: schemas.UpdatedProduct, db: AsyncSession = Depends(get_db), user: schemas.User = Depends(get_current_user)):
-    result = await db.execute(select(models.Product).where(models.Product.business_id == user))
-    product_valid = result.scalar_one_or_none()
-    if not product_valid:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
-                             detail="This is not your product.")
     result = await db.execute(select(models.Product).where(models.Product.id == id))
     product = result.scalar_one_or_none()
+    if product and product.business_id != user.id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                             detail="This is not your product.")
     if product:
+        old_category = product.category
         product.name = update.name
         product.category = update.category
         product.original_price = update.original_price
         product.new_price = update.new_price
         product.product_details = update.product_details
         product.offer_expiration_date = update.offer_expiration_date
-        product.percentage_discount = ((product.original_price - product.new_price) / product.original_price) * 100
+        product.percentage_discount = discount_percent(product.original_price, product.new_price)
+        await db.flush()
+        await CategorySummaryService.refresh(db, [old_category, product.category])
         await db.commit()
+        await invalidate_tags(*product_tags(id, [old_category, product.category], product.business_id))
         return {"message": "Product Updated Successfully"}
     else:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
@@ -0,0 +1,75 @@
+from eApp import models, schemas
+from eApp.config import CONFIG
+from sqlalchemy import Integer, Numeric, cast, func, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends
+from eApp.database import get_read_db, on_replica
+from eApp.cache import cache_key, cached
+from eApp.internal.catalog import product_filters, filter_conditions
+
+router = APIRouter(tags=["Facets"])
+
+
+def _buckets(edges: list, counts: dict) -> list:
+    """width_bucket() index -> {min, max, count}; bucket 0 is below the first edge"""
+    bounds = [0] + list(edges) + [None]
+    return [{
+        "min": bounds[index],
+        "max": bounds[index + 1],
+        "count": counts.get(index, 0),
+    } for index in range(len(bounds) - 1)]
+
+
+async def load_facets(db: AsyncSession, filters: schemas.ProductFilters) -> dict:
+    price_bucket = func.width_bucket(models.Product.new_price, cast(array(CONFIG.PRICE_FACET_EDGES), ARRAY(Numeric)))
+    discount_bucket = func.width_bucket(models.Product.percentage_discount, cast(array(CONFIG.DISCOUNT_FACET_EDGES), ARRAY(Integer)))
+
+    # one scan, three groupings; grouping(x) = 1 marks rows where x was rolled up
+    stmt = (
+        select(
+            models.Product.category,
+            price_bucket.label("price_bucket"),
+            discount_bucket.label("discount_bucket"),
+            func.grouping(models.Product.category).label("no_category"),
+            func.grouping(price_bucket).label("no_price"),
+            func.count().label("count"),
+        )
+        .where(*filter_conditions(filters))
+        .group_by(func.grouping_sets(
+            tuple_(models.Product.category),
+            tuple_(price_bucket),
+            tuple_(discount_bucket),
+        ))
+    )
+    result = await db.execute(stmt)
+
+    categories, prices, discounts = {}, {}, {}
+    total = 0
+    for category, price, discount, no_category, no_price, count in result.all():
+        if not no_category:
+            total += count
+            if category is not None:
+                categories[category] = count
+        elif not no_price:
+            if price is not None:
+                prices[price] = count
+        elif discount is not None:
+            discounts[discount] = count
+
+    return {
+        "total": total,
+        "category": [{"category": category, "count": count} for category, count in sorted(categories.items())],
+        "price": _buckets(CONFIG.PRICE_FACET_EDGES, prices),
+        "discount": _buckets(CONFIG.DISCOUNT_FACET_EDGES, discounts),
+    }
+
+
+#------------------------------ Facet Counts For The Catalog ------------------------------
+# Counts for the filter panel (category, price bucket, discount range) under the
+# current filters, computed in one GROUPING SETS query and cached per filter signature.
+@router.get("/get/product/facets")
+async def get_product_facets(filters: schemas.ProductFilters = Depends(product_filters), db: AsyncSession = Depends(get_read_db)):
+    tags = [f"category:{filters.category}"] if filters.category is not None else ["catalog"]
+    return await cached(cache_key("facets", **filters.model_dump()), lambda: load_facets(db, filters), tags=tags,
+                        replica=on_replica(db))
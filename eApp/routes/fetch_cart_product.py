@@ -1,32 +1,45 @@
-from eApp import models
-from sqlalchemy import select
+from eApp import schemas
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends
 from eApp.database import get_db
+from eApp.passHasing import get_current_user
+from eApp.services.cart_service import CartService
+from eApp.services.favourite_service import FavouriteService
 
 router = APIRouter(
     tags=["show cart product"]
 )
 
 
+# The cart (with its price snapshot) comes from the user's redis hash, the products
+# from one multi-get query; the summary covers exactly the lines listed
 @router.get('/get/cart/product')
-async def get_cart_product(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(models.Product).where(models.Product.add_to_cart.is_(True))
-    )
-    products = result.scalars().all()
-    return {
-        "User All Product": [{
+async def get_cart_product(user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    lines, products, summary = await CartService.get_priced_lines(db, user.id)
+    documents = []
+    for product_id, product in products.items():
+        qty, unit_cents, original_cents = lines[product_id]
+        documents.append({
             "id": product.id,
             "Product Name": product.name,
             "Category": product.category,
-            "Original Price": float(product.original_price),
-            "New Price": float(product.new_price),
+            "Original Price": original_cents / 100,
+            "New Price": unit_cents / 100,
             "Percentage Discount": product.percentage_discount,
             "Offer Expiration Date": product.offer_expiration_date,
             "Product Details": product.product_details,
             "Product Image": product.product_image,
-            "Cart": product.add_to_cart,
-            "Favourite": product.is_favourite,
-        } for product in products]
-    }
\ No newline at end of file
+            "Quantity": qty,
+            "Line Total": qty * unit_cents / 100,
+        })
+    await FavouriteService.annotate(db, user.id, documents, favourite_field="Favourite", cart_field="Cart")
+    return {
+        "User All Product": documents,
+        "Summary": summary,
+    }
+
+
+# O(1): reads the totals the cart scripts maintain, never touches product rows
+@router.get('/get/cart/summary')
+async def get_cart_summary(user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    return await CartService.get_summary(db, user.id)
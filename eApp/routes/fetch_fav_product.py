@@ -1,32 +1,33 @@
-from eApp import models
-from sqlalchemy import select
+from eApp import schemas
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends
 from eApp.database import get_db
+from eApp.passHasing import get_current_user
+from eApp.internal.catalog import fetch_products_by_ids
+from eApp.services.favourite_service import FavouriteService
 
 router = APIRouter(
     tags=["show favourite product"]
 )
 
 
+# Favourite ids come from the user's redis set, the products from one multi-get query
 @router.get('/get/fav/product')
-async def get_favourite_product(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(models.Product).where(models.Product.is_favourite.is_(True))
-    )
-    products = result.scalars().all()
+async def get_favourite_product(user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    favourite_ids = await FavouriteService.get_ids(db, user.id)
+    products = await fetch_products_by_ids(db, sorted(favourite_ids))
+    documents = [{
+        "id": product.id,
+        "Product Name": product.name,
+        "Category": product.category,
+        "Original Price": float(product.original_price),
+        "New Price": float(product.new_price),
+        "Percentage Discount": product.percentage_discount,
+        "Offer Expiration Date": product.offer_expiration_date,
+        "Product Details": product.product_details,
+        "Product Image": product.product_image,
+    } for product in products.values()]
+    await FavouriteService.annotate(db, user.id, documents, favourite_field="Favourite", cart_field="Cart")
     return {
-        "User All Product": [{
-            "id": product.id,
-            "Product Name": product.name,
-            "Category": product.category,
-            "Original Price": float(product.original_price),
-            "New Price": float(product.new_price),
-            "Percentage Discount": product.percentage_discount,
-            "Offer Expiration Date": product.offer_expiration_date,
-            "Product Details": product.product_details,
-            "Product Image": product.product_image,
-            "Cart": product.add_to_cart,
-            "Favourite": product.is_favourite,
-        } for product in products]
-    }
\ No newline at end of file
+        "User All Product": documents
+    }
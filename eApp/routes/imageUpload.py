@@ -1,9 +1,9 @@
-import secrets # python-inbuild to generate hex token -> use to store our image files
-from PIL import Image
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from eApp import schemas,models,passHasing
 from eApp.database import get_db
+from eApp.cache import invalidate_tags
+from eApp.internal.uploads import save_profile_picture
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from fastapi import APIRouter,File,UploadFile,Depends,HTTPException,status
@@ -25,29 +25,7 @@ async def create_upload_file(
     user : schemas.User = Depends(passHasing.get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    PATH = 'eApp/static/images'
-    filename = file.filename
-    extention = filename.split('.')[1]
-
-    if extention not in ['png','jpg','jpeg']:
-        return {"status" : 'File extention should in .png .jpg and .jpeg'}
-    token_name = secrets.token_hex(10)+'.'+extention
-    generatePath = f"{PATH}/{token_name}"
-    file_content = await file.read()
-
-    # wb -> write in binary 
-    with open(generatePath,"wb") as fille:
-        fille.write(file_content)
-        
-    
-    # Pillow -> to reduce file resolution size etc.
-    img = Image.open(generatePath)
-    img = img.resize(size=(200,200))
-    img.save(generatePath)
-    await file.close()
-
-    #user:
-    result = await db.execute(select(models.Business).where(models.Business.owner==user))
+    result = await db.execute(select(models.Business).where(models.Business.owner==user.id))
     owner = result.scalar_one_or_none()
     if not owner:
        raise HTTPException(
@@ -55,9 +33,13 @@ async def create_upload_file(
         detail="Not Authenticated User",
         headers={"WWW-Authenticate": "Bearer"}
     )
+
+    # streamed to disk in chunks, resized to 200x200 in the image process pool
+    token_name = await save_profile_picture(file)
+
     owner.logo = token_name
     await db.commit()
-    file_url = f"static/images/{token_name}"
+    await invalidate_tags(f"business:{user.id}")
     return token_name
 
 #--------------------------get the image-------------------------
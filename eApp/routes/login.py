@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from eApp.database import get_db
-from eApp.passHasing import verify_password
-from datetime import timedelta, datetime
-from jose import jwt
+from typing import Optional
+from eApp.passHasing import verify_password_async, decode_token, load_token_user, get_current_user, oauth2_scheme
+from eApp.internal.tokens import REFRESH, token_pair, revoke, revoke_family, token_state
+from eApp.internal.rate_limit import check_login_attempt, reset_login_attempts
+from eApp.internal.principal_cache import PRINCIPALS, Principal, publish_token_revoked, publish_user_changed, token_key
+import jwt
+from redis.exceptions import RedisError
 from eApp.config import CONFIG
 from dotenv import dotenv_values
 from eApp import schemas, models
@@ -16,9 +20,18 @@ router = APIRouter(tags=['login'])
 # Token generation endpoint/login endpoint
 @router.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db),
 ):
+    # throttled before the users query and the argon2 verify
+    retry_after = await check_login_attempt(request.client.host if request.client else "unknown", form_data.username)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(retry_after)},
+        )
     user = await authenticate_user(form_data.username, form_data.password, db)
     if user is None:
         raise HTTPException(
@@ -26,8 +39,74 @@ async def login_for_access_token(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token({"id": user.id, "email": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    await reset_login_attempts(form_data.username)
+    return token_pair(user)
+
+
+# Rotation: the refresh token is revoked on use and a new pair of the same family is
+# issued. A refresh token presented twice was stolen: the whole family is revoked, so
+# neither the thief nor the legitimate client can keep refreshing, and the user's
+# cached principals are dropped so its access tokens are re-checked right away.
+@router.post("/token/refresh", response_model=schemas.Token)
+async def refresh_access_token(body: schemas.RefreshRequest, db: AsyncSession = Depends(get_db)):
+    payload = decode_token(body.refresh_token)
+    if payload.get("type") != REFRESH or "jti" not in payload:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token type.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    try:
+        revoked, _ = await token_state(payload)
+        first_use = not revoked and await revoke(payload)
+        if not first_use:
+            await revoke_family(payload)
+    except RedisError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy. Please try again.",
+            headers={"Retry-After": "1"},
+        )
+    if not first_use:
+        await publish_user_changed(payload["id"])
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has already been used. Please log in.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # the one users query per access token lifetime: picks up role/paid/verified changes
+    user = await load_token_user(payload, db)
+    return token_pair(user, payload.get("fam"))
+
+
+@router.post("/logout")
+async def logout(
+    body: Optional[schemas.LogoutRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    user: Principal = Depends(get_current_user),
+):
+    claims = decode_token(token)
+    refresh = None
+    if body and body.refresh_token:
+        try:
+            refresh = jwt.decode(body.refresh_token, CONFIG.SECRET_KEY, algorithms=[CONFIG.ALGORITHM])
+        except jwt.InvalidTokenError:
+            refresh = None
+    try:
+        await revoke(claims)
+        await publish_token_revoked(token_key(token))
+        if refresh and refresh.get("type") == REFRESH and refresh.get("id") == user.id:
+            await revoke(refresh)
+    except RedisError:
+        # the revocation is not recorded: at least stop serving the token from this
+        # process's cache, and have the client retry
+        PRINCIPALS.invalidate_token(token_key(token))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy. Please try again.",
+            headers={"Retry-After": "1"},
+        )
+    return {"detail": "Logged out."}
 
 
 #-------------------------------Necessary function------------------------------------
@@ -43,21 +122,6 @@ async def authenticate_user(username: str, password: str, db: AsyncSession):
     user = result.scalar_one_or_none()
     if not user:
         return None
-    if not verify_password(password, user.password):
+    if not await verify_password_async(password, user.password):
         return None
     return user
-
-
-# Function to create access token
-def create_access_token(data: dict, expires_delta: timedelta = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now() + expires_delta
-    else:
-        expire = datetime.now() + timedelta(minutes=180)
-    to_encode.update({"exp": expire})
-    print(config_crediential)
-    encoded_jwt = jwt.encode(to_encode,CONFIG.SECRET_KEY, algorithm=CONFIG.ALGORITHM)
-    return encoded_jwt
-
-
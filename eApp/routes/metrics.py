@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+from eApp.passHasing import get_admin_user
+from eApp.internal.metrics import REGISTRY
+from eApp.redis_setup import redis_cache
+
+router = APIRouter(tags=["metrics"])
+
+
+# In-process metrics of this worker (hash pool, principal cache, login limiter)
+# plus the SMTP counters the celery workers share in redis. Admins only.
+@router.get("/metrics", dependencies=[Depends(get_admin_user)])
+async def get_metrics():
+    snapshot = REGISTRY.snapshot()
+    try:
+        smtp = {field: float(value) for field, value in (await redis_cache.hgetall("metrics:smtp")).items()}
+    except Exception:
+        smtp = {}
+    if smtp.get("connections_opened"):
+        smtp["messages_per_connection"] = smtp.get("messages_sent", 0) / smtp["connections_opened"]
+    if smtp.get("messages_sent"):
+        smtp["avg_send_seconds"] = smtp.get("send_seconds", 0) / smtp["messages_sent"]
+    snapshot["smtp"] = smtp
+    return snapshot
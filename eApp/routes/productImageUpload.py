@@ -1,10 +1,12 @@
-import secrets # python-inbuild to generate hex token -> use to store our image files
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 from eApp import schemas,models,passHasing
 from eApp.database import get_db
+from eApp.services.category_summary_service import CategorySummaryService
+from eApp.cache import invalidate_tags, product_tags
+from eApp.internal.uploads import IMAGE_DIR, save_product_picture
 from fastapi import APIRouter,File,UploadFile,Depends,HTTPException,status
 
 router = APIRouter(tags=['Image-Upload'])
@@ -24,53 +26,25 @@ async def create_product_picture(
     user : schemas.User = Depends(passHasing.get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(select(models.Business).where(models.Business.owner == user))
-    user_business = result.scalar_one_or_none()
-    if not user_business:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not Authorized To Perform This Task."
-        )
-
-    result = await db.execute(select(models.Product).where(models.Product.business_id == user_business.owner))
-    product_valid = result.scalar_one_or_none()
-    if not product_valid:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="This is not your product."
-        )
-
     result = await db.execute(select(models.Product).where(models.Product.id == id))
     product = result.scalar_one_or_none()
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-
-    PATH = 'eApp/static/images'
-    filename = file.filename
-    extention = filename.split('.')[1]
-
-    if extention not in ['png','jpg','jpeg']:
-        return {"status" : 'File extention should in .png .jpg and .jpeg'}
-    token_name = secrets.token_hex(10)+'.'+extention
-    generatePath = f"{PATH}/{token_name}"
-    file_content = await file.read()
-
-    # wb -> write in binary 
-    with open(generatePath,"wb") as fille:
-        fille.write(file_content)
-
-    owner = user_business
-    if not owner:
+    if product.business_id != user.id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not Authenticated User",
-            headers={"WWW-Authenticate": "Bearer"}
+            detail="This is not your product."
         )
+
+    # streamed to disk in chunks, decoded and scaled down in the image process pool
+    token_name = await save_product_picture(file)
+
     product.product_image = token_name
+    await db.flush()
+    await CategorySummaryService.refresh(db, [product.category])
     await db.commit()
-    file_url = f"static/images/{token_name}"
-    return FileResponse(path=file_url)
-
+    await invalidate_tags(*product_tags(product.id, [product.category], product.business_id))
+    return FileResponse(path=f"{IMAGE_DIR}/{token_name}")
 
 # router.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -1,18 +1,28 @@
 from eApp import models, schemas
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from eApp.database import get_db
 from eApp.passHasing import get_current_user
+from eApp.internal.conditional import not_modified
 
 router = APIRouter(
     tags=['Profile']
 )
 
 
-@router.post("/user/me")
-async def user_login(user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.User).where(models.User.id == user))
+# GET is the pollable form; POST is kept for existing clients.
+# The version stamp is the `business:<user id>` tag watermark, bumped by the
+# profile, logo and product write paths of this user.
+@router.api_route("/user/me", methods=["GET", "POST"])
+async def user_login(request: Request, response: Response, user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    response.headers["Vary"] = "Authorization"
+    unchanged = await not_modified(request, response, [f"business:{user.id}"])
+    if unchanged:
+        unchanged.headers["Vary"] = "Authorization"
+        return unchanged
+
+    result = await db.execute(select(models.User).where(models.User.id == user.id))
     current_user = result.scalar_one_or_none()
     if not current_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
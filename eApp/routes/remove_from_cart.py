@@ -1,9 +1,11 @@
 
-from eApp import models
-from sqlalchemy import select
+from eApp import schemas
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends
 from eApp.database import get_db
+from eApp.cache import invalidate_tags
+from eApp.passHasing import get_current_user
+from eApp.services.cart_service import CartService
 
 router = APIRouter(
     tags=["remove from  cart"]
@@ -11,16 +13,7 @@ router = APIRouter(
 
 
 @router.post('/remove/from/cart')
-async def remove_from_cart(id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.Product).where(models.Product.id == id))
-    product = result.scalar_one_or_none()
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not exist."
-        )
-    product.add_to_cart = False
-    db.add(product)
-    await db.commit()
-    await db.refresh(product)
+async def remove_from_cart(id: int, user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    await CartService.remove(db, user.id, id)
+    await invalidate_tags(f"user:{user.id}")
     return {"detail": "Successfully removed from cart list"}
@@ -1,9 +1,10 @@
-
-from eApp import models
-from sqlalchemy import select
+from eApp import schemas
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends
 from eApp.database import get_db
+from eApp.cache import invalidate_tags
+from eApp.passHasing import get_current_user
+from eApp.services.favourite_service import FavouriteService
 
 router = APIRouter(
     tags=["Remove From Favourite"]
@@ -11,16 +12,7 @@ router = APIRouter(
 
 
 @router.post('/remove/from/favourite')
-async def remove_from_favourite(id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.Product).where(models.Product.id == id))
-    product = result.scalar_one_or_none()
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not exist."
-        )
-    product.is_favourite = False
-    db.add(product)
-    await db.commit()
-    await db.refresh(product)
-    return {"detail": "Successfully removed from favourite list"}
\ No newline at end of file
+async def remove_from_favourite(id: int, user: schemas.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    await FavouriteService.remove(db, user.id, id)
+    await invalidate_tags(f"user:{user.id}")
+    return {"detail": "Successfully removed from favourite list"}
@@ -0,0 +1,81 @@
+from typing import Optional
+from eApp import models, schemas
+from eApp.config import CONFIG
+from sqlalchemy import func, select, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, Query
+from eApp.database import get_read_db
+from eApp.passHasing import get_optional_user
+from eApp.services.favourite_service import FavouriteService
+from eApp.internal.catalog import product_filters, filter_conditions, product_document
+
+router = APIRouter(tags=["Search"])
+
+# must match the text search configuration of models.PRODUCT_SEARCH_VECTOR
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=25, MinWords=8"
+HTML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#39;"))
+
+
+def html_escaped(column):
+    """
+    `column` with HTML special characters escaped in SQL. Highlights are rendered
+    as HTML, so merchant text must be escaped before ts_headline adds the <mark>
+    tags (the parser keeps entities as single tokens, so matching is unchanged).
+    """
+    for char, entity in HTML_ESCAPES:
+        column = func.replace(column, char, entity)
+    return column
+
+
+#---------------------------------- Full Text Product Search ----------------------------------
+# Matching and ranking run against the GIN indexed `search_vector` column.
+# ts_headline is expensive, so it is only evaluated for the rows of the requested page.
+@router.get("/search/products")
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    limit: int = Query(CONFIG.PRODUCT_PAGE_SIZE, ge=1, le=CONFIG.PRODUCT_PAGE_SIZE_MAX),
+    filters: schemas.ProductFilters = Depends(product_filters),
+    user: Optional[schemas.User] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank_cd(models.Product.search_vector, query)
+
+    # fetch one extra row to know whether there is a next page
+    ranked = (
+        select(models.Product.id, rank.label("rank"))
+        .where(models.Product.search_vector.op("@@")(query), *filter_conditions(filters))
+        .order_by(rank.desc(), models.Product.id)
+        .limit(limit + 1)
+        .offset((page - 1) * limit)
+        .subquery()
+    )
+    stmt = (
+        select(
+            models.Product,
+            ranked.c.rank,
+            func.ts_headline(SEARCH_CONFIG, html_escaped(models.Product.name), query, HEADLINE_OPTIONS).label("name_highlight"),
+            func.ts_headline(SEARCH_CONFIG, html_escaped(models.Product.product_details), query, HEADLINE_OPTIONS).label("details_highlight"),
+        )
+        .join(ranked, ranked.c.id == models.Product.id)
+        .order_by(ranked.c.rank.desc(), models.Product.id)
+    )
+    result = await db.execute(stmt)
+    rows = result.all()
+
+    documents = [{
+        **product_document(product),
+        "rank": float(score),
+        "highlight": {
+            "name": name_highlight,
+            "product_details": details_highlight,
+        },
+    } for product, score, name_highlight, details_highlight in rows[:limit]]
+    await FavouriteService.annotate(db, user.id if user else None, documents)
+    return {
+        "products": documents,
+        "page": page,
+        "next_page": page + 1 if len(rows) > limit else None,
+    }
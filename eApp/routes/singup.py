@@ -1,43 +1,76 @@
-from eApp import models,schemas
-from sqlalchemy import select
+from eApp import schemas
+from sqlalchemy import text
 from eApp.database import db_dependency
-from eApp.passHasing import get_password_hash
+from eApp.passHasing import get_password_hash_async
 from fastapi import status,APIRouter,HTTPException
-from eApp.email_verification import EmailSchema,send_email
+from eApp.services.email_outbox_service import VERIFICATION_SUBJECT, VERIFICATION_TEMPLATE
+from eApp.worker.celery_app import celery_app_payment
 
 
 router = APIRouter(tags=['SignUP'])
 
 #_________________________________ REGISTRATION ENDPOINT _________________________________
 
+# One statement, one round trip: the user, their business and the verification
+# mail (queued as template + context, the drainer mints the link token) are
+# inserted together. A taken email inserts nothing and returns no row.
+# Column values mirror the python-side defaults of models.User/Business.
+SIGNUP_SQL = text("""
+    WITH new_user AS (
+        INSERT INTO users (username, email, password, is_verified, join_date, free_count, paid_status, role, is_active)
+        VALUES (:username, :email, :password, false, localtimestamp, 3, false, 'user', true)
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, username, email
+    ), new_business AS (
+        INSERT INTO business (business_name, city, region, business_description, logo, owner)
+        SELECT :business_name, 'Unspecified', 'Unspecified', 'No Business Description', 'default.jpg', id
+        FROM new_user
+    ), verification_mail AS (
+        INSERT INTO email_outbox (recipients, subject, template, context, status, attempts, next_attempt_at, created_at)
+        SELECT ARRAY[email], :subject, :template, jsonb_build_object('id', id, 'username', username),
+               'pending', 0, now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc'
+        FROM new_user
+    )
+    SELECT id FROM new_user
+""")
+
+# Cheap pre-check so a taken email never costs an argon2 hash; ON CONFLICT above
+# only has to cover two signups racing for the same email.
+EMAIL_TAKEN_SQL = text("SELECT 1 FROM users WHERE email = :email")
+
+
 @router.post('/registration', status_code=status.HTTP_201_CREATED)
 async def user_registration(user: schemas.User, db: db_dependency):
-    user_data = user.model_dump(exclude_unset=True)
-    user_data["password"] = get_password_hash(user_data["password"])
-    result = await db.execute(select(models.User).where(models.User.email == user.email))
-    fnd = result.scalar_one_or_none()
-    if fnd:
+    result = await db.execute(EMAIL_TAKEN_SQL, {"email": user.email})
+    if result.first() is not None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Email already exists.")
+
+    # hash only once the email is known to be free; argon2 runs in the hash process pool
+    password = await get_password_hash_async(user.password)
     try:
-        new_user = models.User(**user_data)
-        db.add(new_user)
-        await db.flush()
-        await db.refresh(new_user)
-
-        email_schema = EmailSchema(email=[new_user.email])
-        await send_email(email_schema, new_user)
-
-        new_business = models.Business(
-            business_name=f"{user_data['username']}'s Business",
-            owner=new_user.id
-        )
-        db.add(new_business)
+        result = await db.execute(SIGNUP_SQL, {
+            "username": user.username,
+            "email": user.email,
+            "password": password,
+            "business_name": f"{user.username}'s Business",
+            "subject": VERIFICATION_SUBJECT,
+            "template": VERIFICATION_TEMPLATE,
+        })
+        new_user_id = result.scalar_one_or_none()
         await db.commit()
-        await db.refresh(new_business)
-
     except Exception as e:
+        # a taken email is not an error here (ON CONFLICT DO NOTHING); anything else is ours
         await db.rollback()
-        print(f"error while signup: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
+        print(f"error while signup: {e!r}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Signup failed.")
+
+    if new_user_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Email already exists.")
+
+    # don't wait for the next beat to send the verification mail
+    try:
+        celery_app_payment.send_task("drain_email_outbox")
+    except Exception as e:
+        print(f"couldn't schedule outbox drain: {e}")
 
     return {"detail":"User Created Successfully. Please Check Your Email To Verify."}
@@ -4,6 +4,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from eApp.passHasing import get_current_user
 from eApp.database import get_db
+from eApp.cache import invalidate_tags
 from fastapi import APIRouter, Depends, HTTPException, status
 
 
@@ -24,7 +25,7 @@ async def upload_profile(
     db: AsyncSession = Depends(get_db)
 ):
     try:
-        result = await db.execute(select(models.Business).where(models.Business.owner==user))
+        result = await db.execute(select(models.Business).where(models.Business.owner==user.id))
         business_profile = result.scalar_one_or_none()
         if not business_profile:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
@@ -35,7 +36,10 @@ async def upload_profile(
         business_profile.business_name = update.business_name
         business_profile.business_description = update.business_description
         await db.commit()
+        await invalidate_tags(f"business:{user.id}")
         return {"detail": "Profile Update Successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail="Profile update failed")
@@ -1,6 +1,11 @@
-from typing import Optional
-from pydantic import BaseModel, validator
-from datetime import datetime
+from decimal import Decimal
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, validator, model_validator
+from datetime import date, datetime
+from eApp.config import CONFIG
+
+# bounds of a postgres integer column; anything outside would fail inside asyncpg
+INT32_MIN, INT32_MAX = -2**31, 2**31 - 1
 ##_______________________Creating Purpouse____________________##
 class User(BaseModel):
     username : str 
@@ -25,16 +30,16 @@ class Product(BaseModel):
     original_price : float
     new_price : float
     percentage_discount : int 
-    offer_expiration_date : str = datetime.utcnow().strftime("%Y-%m-%d")
+    offer_expiration_date : Optional[date] = None
     product_image : str 
     business_id : int
     add_to_cart : bool 
     is_favourite : bool 
     @validator('offer_expiration_date', pre=True, always=True)
     def set_default_offer_expiration_date(cls, value):
-        if value == "string" or None:
-            # If offer_expiration_date is not provided, set it to the current date
-            return datetime.utcnow().date().strftime("%Y-%m-%d")
+        if value in ("string", "", None):
+            # No date means the offer never expires; the sweeper only ends dated offers
+            return None
         return value
 
 
@@ -42,6 +47,14 @@ class Product(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # access token lifetime in seconds
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
     
 
 #upload product
@@ -51,12 +64,12 @@ class UploadProduct(BaseModel):
     original_price : float
     new_price : float
     product_details : str
-    offer_expiration_date : str = datetime.utcnow().strftime("%Y-%m-%d")
+    offer_expiration_date : Optional[date] = None
     @validator('offer_expiration_date', pre=True, always=True)
     def set_default_offer_expiration_date(cls, value):
-        if value == "string" or None:
-            # If offer_expiration_date is not provided, set it to the current date
-            return datetime.utcnow().date().strftime("%Y-%m-%d")
+        if value in ("string", "", None):
+            # No date means the offer never expires; the sweeper only ends dated offers
+            return None
         return value
 
 #updated product model:
@@ -66,13 +79,67 @@ class UpdatedProduct(BaseModel):
     product_details : str 
     original_price : float
     new_price : float
-    offer_expiration_date : str = datetime.utcnow().strftime("%Y-%m-%d")
+    offer_expiration_date : Optional[date] = None
     @validator('offer_expiration_date', pre=True, always=True)
     def set_default_offer_expiration_date(cls, value):
-        if value == "string" or None:
-            return datetime.utcnow().date().strftime("%Y-%m-%d")
+        if value in ("string", "", None):
+            # No date means the offer never expires; the sweeper only ends dated offers
+            return None
+        return value
+
+
+#batch price/discount update: either explicit items or a category rule
+class PriceUpdateItem(BaseModel):
+    id : int = Field(ge=1, le=INT32_MAX)
+    new_price : float = Field(ge=0, lt=10**8)  # products.new_price is NUMERIC(10, 2)
+    offer_expiration_date : Optional[date] = None
+    @validator('new_price')
+    def at_most_two_decimal_places(cls, value):
+        if Decimal(str(value)).as_tuple().exponent < -2:
+            raise ValueError("new_price has more than 2 decimal places.")
         return value
 
+class PriceRule(BaseModel):
+    category : str
+    percent_off : float = Field(gt=0, lt=100)  # applied to original_price
+    offer_expiration_date : Optional[date] = None
+
+class BatchPriceUpdate(BaseModel):
+    items : Optional[List[PriceUpdateItem]] = Field(None, max_length=CONFIG.BATCH_UPDATE_MAX_ITEMS)
+    rule : Optional[PriceRule] = None
+    @model_validator(mode="after")
+    def exactly_one_mode(self):
+        if (self.items is None) == (self.rule is None):
+            raise ValueError("Send either items or rule.")
+        return self
+
+
+#batch cart/favourite mutations: operations are applied in the order sent
+class CartOperation(BaseModel):
+    op : Literal["add", "remove"]
+    product_id : int = Field(ge=1, le=INT32_MAX)
+    qty : int = Field(1, ge=1)  # ignored for remove, capped at CART_MAX_QTY
+
+class CartBatch(BaseModel):
+    operations : List[CartOperation] = Field(max_length=CONFIG.STATE_BATCH_MAX_OPS)
+
+class FavouriteOperation(BaseModel):
+    op : Literal["add", "remove"]
+    product_id : int = Field(ge=1, le=INT32_MAX)
+
+class FavouriteBatch(BaseModel):
+    operations : List[FavouriteOperation] = Field(max_length=CONFIG.STATE_BATCH_MAX_OPS)
+
+
+#product listing filters: shared by /get/product and the catalog helpers
+class ProductFilters(BaseModel):
+    category : Optional[str] = None
+    min_price : Optional[float] = None
+    max_price : Optional[float] = None
+    min_discount : Optional[int] = None
+    max_discount : Optional[int] = None
+    active_offers : bool = False
+
 
 class InputMessage(BaseModel):
     message: str
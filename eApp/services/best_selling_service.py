@@ -0,0 +1,100 @@
+"""
+============================ Best Selling Feed ===============================
+The feed is served from `product_ranking`, an aggregated table that the
+`refresh_product_ranking` beat task rebuilds. Home page loads read a slice of
+that table by rank instead of sorting the whole products table.
+"""
+import random
+from typing import List
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from eApp import models
+from eApp.config import CONFIG
+
+
+# There is no order table yet, so the score is built from the engagement
+# signals we do store: units sitting in carts, favourites and the size of the discount.
+REFRESH_RANKING_SQL = text("""
+    INSERT INTO product_ranking (product_id, rank, score, refreshed_at)
+    SELECT id, row_number() OVER (ORDER BY score DESC, id), score, now()
+    FROM (
+        SELECT p.id,
+               (3 * coalesce(c.units, 0)
+                + 2 * coalesce(f.fans, 0)
+                + coalesce(p.percentage_discount, 0) / 100.0) AS score
+        FROM products p
+        LEFT JOIN (
+            SELECT product_id, sum(qty) AS units FROM cart_items GROUP BY product_id
+        ) c ON c.product_id = p.id
+        LEFT JOIN (
+            SELECT product_id, count(*) AS fans FROM favourites GROUP BY product_id
+        ) f ON f.product_id = p.id
+        ORDER BY score DESC, p.id
+        LIMIT :feed_size
+    ) ranked
+""")
+
+FEED_COLUMNS = (
+    models.Product.id,
+    models.Product.name,
+    models.Product.product_image,
+    models.Product.new_price,
+    models.Product.percentage_discount,
+    models.Product.offer_expiration_date,
+    models.Product.is_favourite,
+    models.Product.add_to_cart,
+    models.Product.product_details,
+)
+
+
+class BestSellingService:
+    @staticmethod
+    def refresh_ranking(session: Session) -> int:
+        """
+        Rebuild the ranking in one transaction (sync: runs inside the celery worker).
+        Readers keep seeing the previous ranking until the commit.
+        Returns:
+            Number of ranked products
+        """
+        session.execute(text("DELETE FROM product_ranking"))
+        result = session.execute(REFRESH_RANKING_SQL, {"feed_size": CONFIG.BEST_SELLING_FEED_SIZE})
+        session.commit()
+        return result.rowcount
+
+    @staticmethod
+    async def get_page(db: AsyncSession, after_rank: int, limit: int) -> List[tuple]:
+        """Feed rows ranked after `after_rank`, each row ends with its rank"""
+        stmt = (
+            select(*FEED_COLUMNS, models.ProductRanking.rank)
+            .join(models.ProductRanking, models.ProductRanking.product_id == models.Product.id)
+            .where(models.ProductRanking.rank > after_rank)
+            .order_by(models.ProductRanking.rank)
+            .limit(limit)
+        )
+        result = await db.execute(stmt)
+        return result.all()
+
+    @staticmethod
+    async def get_shuffled(db: AsyncSession, limit: int) -> List[tuple]:
+        """
+        Random sample from the top BEST_SELLING_POOL_SIZE ranked ids.
+        Only the small pool is read and sampled, the products table is never sorted.
+        """
+        result = await db.execute(
+            select(models.ProductRanking.product_id)
+            .where(models.ProductRanking.rank <= CONFIG.BEST_SELLING_POOL_SIZE)
+        )
+        pool = result.scalars().all()
+        picked = random.sample(pool, min(limit, len(pool)))
+        if not picked:
+            return []
+        result = await db.execute(select(*FEED_COLUMNS).where(models.Product.id.in_(picked)))
+        rows = {row.id: row for row in result.all()}
+        return [rows[product_id] for product_id in picked if product_id in rows]
+
+    @staticmethod
+    async def get_newest(db: AsyncSession, limit: int) -> List[tuple]:
+        """Fallback used before the first ranking refresh has run"""
+        result = await db.execute(select(*FEED_COLUMNS).order_by(models.Product.id.desc()).limit(limit))
+        return result.all()
@@ -0,0 +1,309 @@
+"""
+============================ Per-User Cart ===============================
+Hot path: the redis hash `cart:<user_id>` in the state db. It holds, per product,
+the quantity (`<product_id>`) and the price snapshot taken when the product was
+first added (`p:<product_id>` = "unit_cents:original_cents"), plus running totals
+(`_count`, `_subtotal`, `_original`) kept in step by the same scripts that change
+the items, so the cart summary is a single HMGET.
+Every mutation also marks the user in the `cart:dirty` set, and the
+`flush_carts` beat task writes dirty carts behind into `cart_items`.
+A cart that is not in redis (first use, or idle past CART_TTL_SECONDS) is
+loaded back from `cart_items` on first access, with its totals computed in SQL.
+"""
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from eApp import models, schemas
+from eApp.config import CONFIG
+from eApp.redis_setup import redis_state
+from eApp.internal.catalog import fetch_products_by_ids
+
+DIRTY_KEY = "cart:dirty"
+# sentinel field: distinguishes "loaded and empty" from "not loaded"
+LOADED_FIELD = "_snapshot"
+PRICE_PREFIX = "p:"
+TOTAL_FIELDS = ("_count", "_subtotal", "_original")
+APPLY_ATTEMPTS = 3
+
+
+class CartUnavailable(Exception):
+    """The cart could not be loaded into redis (evicted again right after every load)"""
+
+
+def cart_key(user_id: int) -> str:
+    return f"cart:{user_id}"
+
+
+def to_cents(price: Optional[Decimal]) -> int:
+    return int((Decimal(price or 0) * 100).to_integral_value())
+
+
+def _items(raw: dict) -> Dict[int, int]:
+    return {int(field): int(value) for field, value in raw.items() if field.isdigit()}
+
+
+def _snapshot(raw: dict) -> Dict[int, Tuple[int, int, int]]:
+    """{product_id: (qty, unit_cents, original_cents)}"""
+    items = {}
+    for product_id, qty in _items(raw).items():
+        unit_cents, original_cents = raw.get(f"{PRICE_PREFIX}{product_id}", "0:0").split(":")
+        items[product_id] = (qty, int(unit_cents), int(original_cents))
+    return items
+
+
+def summarize(lines: Dict[int, Tuple[int, int, int]]) -> dict:
+    """_summary() of the given {product_id: (qty, unit_cents, original_cents)} lines"""
+    return _summary(
+        sum(qty for qty, _, _ in lines.values()),
+        sum(qty * unit_cents for qty, unit_cents, _ in lines.values()),
+        sum(qty * original_cents for qty, _, original_cents in lines.values()),
+    )
+
+
+def _summary(count, subtotal, original) -> dict:
+    count, subtotal, original = int(count or 0), int(subtotal or 0), int(original or 0)
+    return {
+        "item_count": count,
+        "subtotal": subtotal / 100,
+        "original_total": original / 100,
+        "total_discount": (original - subtotal) / 100,
+    }
+
+
+# Loads the cart and its totals in one query; rows written before prices were
+# snapshotted fall back to the product's current prices.
+LOAD_CART_SQL = text("""
+    SELECT product_id, qty, unit_cents, original_cents,
+           sum(qty) OVER () AS item_count,
+           sum(qty * unit_cents) OVER () AS subtotal_cents,
+           sum(qty * original_cents) OVER () AS original_total_cents
+    FROM (
+        SELECT ci.product_id, ci.qty,
+               round(coalesce(ci.unit_price, p.new_price, 0) * 100)::bigint AS unit_cents,
+               round(coalesce(ci.original_price, p.original_price, 0) * 100)::bigint AS original_cents
+        FROM cart_items ci
+        JOIN products p ON p.id = ci.product_id
+        WHERE ci.user_id = :user_id
+    ) items
+""")
+
+# Replace the user's rows with the redis snapshot; ids of deleted products are skipped
+DELETE_MISSING_SQL = text("""
+    DELETE FROM cart_items
+    WHERE user_id = :user_id AND NOT (product_id = ANY(:product_ids))
+""")
+UPSERT_ITEMS_SQL = text("""
+    INSERT INTO cart_items (user_id, product_id, qty, unit_price, original_price, updated_at)
+    SELECT :user_id, v.product_id, v.qty, v.unit_cents / 100.0, v.original_cents / 100.0, now()
+    FROM unnest(
+        CAST(:product_ids AS integer[]), CAST(:qtys AS integer[]),
+        CAST(:unit_cents AS bigint[]), CAST(:original_cents AS bigint[])
+    ) AS v(product_id, qty, unit_cents, original_cents)
+    JOIN products p ON p.id = v.product_id
+    ON CONFLICT (user_id, product_id) DO UPDATE SET
+        qty = EXCLUDED.qty,
+        unit_price = EXCLUDED.unit_price,
+        original_price = EXCLUDED.original_price,
+        updated_at = now()
+""")
+
+# Fills an unloaded cart. Does nothing if another request loaded it first, so a
+# mutation applied in between is never overwritten. A hash left over from an
+# older layout (no sentinel) is replaced.
+# ARGV: ttl, item_count, subtotal_cents, original_cents, then (product_id, qty, "unit:orig") triples.
+LOAD_LUA = """
+local key = KEYS[1]
+if redis.call('HEXISTS', key, '_snapshot') == 1 then
+    return 0
+end
+redis.call('DEL', key)
+for i = 5, #ARGV, 3 do
+    redis.call('HSET', key, ARGV[i], ARGV[i + 1], 'p:' .. ARGV[i], ARGV[i + 2])
+end
+redis.call('HSET', key, '_count', ARGV[2], '_subtotal', ARGV[3], '_original', ARGV[4], '_snapshot', 1)
+redis.call('EXPIRE', key, tonumber(ARGV[1]))
+return 1
+"""
+
+# Applies add/remove operations in order and keeps the totals in step, atomically.
+# Returns false when the cart is not loaded (evicted since the caller checked).
+# A product keeps the prices it had when it was first added.
+# ARGV: max qty, ttl, user id, then (op, product_id, qty, unit_cents, original_cents) groups.
+APPLY_LUA = """
+local key, dirty = KEYS[1], KEYS[2]
+if redis.call('HEXISTS', key, '_snapshot') == 0 then
+    return false
+end
+local max_qty = tonumber(ARGV[1])
+for i = 4, #ARGV, 5 do
+    local product_id = ARGV[i + 1]
+    local price_field = 'p:' .. product_id
+    local old = tonumber(redis.call('HGET', key, product_id) or '0')
+    local unit, original = tonumber(ARGV[i + 3]), tonumber(ARGV[i + 4])
+    local price = redis.call('HGET', key, price_field)
+    if price then
+        local sep = string.find(price, ':', 1, true)
+        unit, original = tonumber(string.sub(price, 1, sep - 1)), tonumber(string.sub(price, sep + 1))
+    end
+    local new = 0
+    if ARGV[i] == 'add' then
+        new = math.min(old + tonumber(ARGV[i + 2]), max_qty)
+        redis.call('HSET', key, product_id, new, price_field, unit .. ':' .. original)
+    else
+        redis.call('HDEL', key, product_id, price_field)
+    end
+    local delta = new - old
+    if delta ~= 0 then
+        redis.call('HINCRBY', key, '_count', delta)
+        redis.call('HINCRBY', key, '_subtotal', delta * unit)
+        redis.call('HINCRBY', key, '_original', delta * original)
+    end
+end
+redis.call('EXPIRE', key, tonumber(ARGV[2]))
+redis.call('SADD', dirty, ARGV[3])
+return redis.call('HGETALL', key)
+"""
+load_script = redis_state.register_script(LOAD_LUA)
+apply_script = redis_state.register_script(APPLY_LUA)
+
+
+class CartService:
+    @staticmethod
+    async def ensure_loaded(db: AsyncSession, user_id: int) -> None:
+        """Load the cart from cart_items into redis unless it is already there"""
+        key = cart_key(user_id)
+        if await redis_state.hexists(key, LOADED_FIELD):
+            return
+        result = await db.execute(LOAD_CART_SQL, {"user_id": user_id})
+        rows = result.all()
+        first = rows[0] if rows else None
+        args = [
+            CONFIG.CART_TTL_SECONDS,
+            first.item_count if first else 0,
+            first.subtotal_cents if first else 0,
+            first.original_total_cents if first else 0,
+        ]
+        for row in rows:
+            args.extend((row.product_id, row.qty, f"{row.unit_cents}:{row.original_cents}"))
+        await load_script(keys=[key], args=args)
+
+    @staticmethod
+    async def get_items(db: AsyncSession, user_id: int) -> Dict[int, int]:
+        """{product_id: qty} for the user's cart"""
+        await CartService.ensure_loaded(db, user_id)
+        return _items(await redis_state.hgetall(cart_key(user_id)))
+
+    @staticmethod
+    async def get_snapshot(db: AsyncSession, user_id: int) -> Tuple[Dict[int, Tuple[int, int, int]], dict]:
+        """({product_id: (qty, unit_cents, original_cents)}, summary) from one HGETALL"""
+        await CartService.ensure_loaded(db, user_id)
+        raw = await redis_state.hgetall(cart_key(user_id))
+        return _snapshot(raw), _summary(*(raw.get(field) for field in TOTAL_FIELDS))
+
+    @staticmethod
+    async def get_priced_lines(db: AsyncSession, user_id: int) -> Tuple[Dict[int, Tuple[int, int, int]], Dict[int, models.Product], dict]:
+        """
+        (lines, products, summary) where lines and summary cover exactly the products
+        that still exist. Lines of deleted products are dropped from the cart too, so
+        the maintained totals (get_summary) stop counting them.
+        """
+        items, _ = await CartService.get_snapshot(db, user_id)
+        products = await fetch_products_by_ids(db, list(items))
+        gone = [product_id for product_id in items if product_id not in products]
+        if gone:
+            operations = [schemas.CartOperation(op="remove", product_id=product_id) for product_id in gone]
+            await CartService.apply_batch(db, user_id, operations, {})
+        lines = {product_id: items[product_id] for product_id in products}
+        return lines, products, summarize(lines)
+
+    @staticmethod
+    async def get_summary(db: AsyncSession, user_id: int) -> dict:
+        """Item count, subtotal, original total and discount: one HMGET on the maintained totals"""
+        key = cart_key(user_id)
+        values = await redis_state.hmget(key, [LOADED_FIELD, *TOTAL_FIELDS])
+        if values[0] is None:
+            await CartService.ensure_loaded(db, user_id)
+            values = await redis_state.hmget(key, [LOADED_FIELD, *TOTAL_FIELDS])
+        return _summary(*values[1:])
+
+    @staticmethod
+    async def add(db: AsyncSession, user_id: int, product: models.Product, qty: int = 1) -> int:
+        """Increase the quantity of a product (capped at CART_MAX_QTY), returns the new quantity"""
+        operation = schemas.CartOperation(op="add", product_id=product.id, qty=qty)
+        items = await CartService.apply_batch(db, user_id, [operation], {product.id: product})
+        return items[product.id]
+
+    @staticmethod
+    async def remove(db: AsyncSession, user_id: int, product_id: int) -> None:
+        operation = schemas.CartOperation(op="remove", product_id=product_id)
+        await CartService.apply_batch(db, user_id, [operation], {})
+
+    @staticmethod
+    async def apply_batch(
+        db: AsyncSession,
+        user_id: int,
+        operations: List[schemas.CartOperation],
+        products: Dict[int, models.Product],
+    ) -> Dict[int, int]:
+        """
+        Apply add/remove operations in order, atomically (one script call).
+        `products` must hold every product being added: its current prices become
+        the snapshot when it is not in the cart yet.
+        Returns:
+            The resulting cart as {product_id: qty}
+        """
+        args = [CONFIG.CART_MAX_QTY, CONFIG.CART_TTL_SECONDS, user_id]
+        for operation in operations:
+            product = products.get(operation.product_id)
+            args.extend((
+                operation.op,
+                str(operation.product_id),
+                operation.qty,
+                to_cents(product.new_price) if product else 0,
+                to_cents(product.original_price) if product else 0,
+            ))
+        keys = [cart_key(user_id), DIRTY_KEY]
+        for _ in range(APPLY_ATTEMPTS):
+            # the script returns nil if the cart was evicted between the load and the call
+            await CartService.ensure_loaded(db, user_id)
+            flat = await apply_script(keys=keys, args=args)
+            if flat is not None:
+                return _items(dict(zip(flat[::2], flat[1::2])))
+        raise CartUnavailable(user_id)
+
+    @staticmethod
+    def flush_dirty(session: Session, redis_client) -> int:
+        """
+        Write dirty carts behind into cart_items (sync: runs inside the celery worker).
+        Users whose flush fails are put back into the dirty set.
+        Returns:
+            Number of carts written
+        """
+        user_ids: List[str] = redis_client.spop(DIRTY_KEY, CONFIG.CART_FLUSH_BATCH_SIZE) or []
+        if not user_ids:
+            return 0
+        try:
+            for user_id in user_ids:
+                raw = redis_client.hgetall(cart_key(user_id))
+                if LOADED_FIELD not in raw:
+                    # evicted before we got here: nothing trustworthy to write
+                    continue
+                items = _snapshot(raw)
+                params = {
+                    "user_id": int(user_id),
+                    "product_ids": list(items),
+                    "qtys": [qty for qty, _, _ in items.values()],
+                    "unit_cents": [unit_cents for _, unit_cents, _ in items.values()],
+                    "original_cents": [original_cents for _, _, original_cents in items.values()],
+                }
+                session.execute(DELETE_MISSING_SQL, params)
+                if items:
+                    session.execute(UPSERT_ITEMS_SQL, params)
+            session.commit()
+        except Exception:
+            session.rollback()
+            redis_client.sadd(DIRTY_KEY, *user_ids)
+            raise
+        return len(user_ids)
@@ -0,0 +1,80 @@
+"""
+============================ Category Summary ===============================
+`category_summary` holds the image, product count and min/max price of every
+category so /Categories is a single primary-key ordered read. The product
+write paths keep it current:
+    - a new product is folded in with a delta upsert (count+1, LEAST/GREATEST)
+    - updates/deletes re-aggregate only the touched categories, which is an
+      index scan on products.category instead of a GROUP BY over the table
+Both paths hold a transaction-level advisory lock per category (LOCK_CATEGORIES_SQL)
+until commit, so a re-aggregation never reads products from before a concurrent
+insert and then overwrites that insert's delta.
+"""
+from typing import Iterable
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# One lock per category, taken in the (sorted) order given so two writers never
+# wait on each other's categories. Must be its own statement: the aggregate that
+# follows then takes its snapshot after every concurrent writer has committed.
+LOCK_CATEGORIES_SQL = text("""
+    SELECT pg_advisory_xact_lock(hashtext(category))
+    FROM unnest(CAST(:categories AS text[])) AS c(category)
+""")
+
+PRODUCT_ADDED_SQL = text("""
+    INSERT INTO category_summary (category, product_image, product_count, min_price, max_price, updated_at)
+    VALUES (:category, :product_image, 1, :price, :price, now())
+    ON CONFLICT (category) DO UPDATE SET
+        product_image = LEAST(category_summary.product_image, EXCLUDED.product_image),
+        product_count = category_summary.product_count + 1,
+        min_price = LEAST(category_summary.min_price, EXCLUDED.min_price),
+        max_price = GREATEST(category_summary.max_price, EXCLUDED.max_price),
+        updated_at = now()
+""")
+
+_AGGREGATE_SQL = """
+    WITH agg AS (
+        SELECT category, min(product_image) AS product_image, count(*) AS product_count,
+               min(new_price) AS min_price, max(new_price) AS max_price
+        FROM products
+        WHERE category IS NOT NULL {where}
+        GROUP BY category
+    ), upsert AS (
+        INSERT INTO category_summary (category, product_image, product_count, min_price, max_price, updated_at)
+        SELECT category, product_image, product_count, min_price, max_price, now() FROM agg
+        ON CONFLICT (category) DO UPDATE SET
+            product_image = EXCLUDED.product_image,
+            product_count = EXCLUDED.product_count,
+            min_price = EXCLUDED.min_price,
+            max_price = EXCLUDED.max_price,
+            updated_at = now()
+    )
+    DELETE FROM category_summary
+    WHERE category NOT IN (SELECT category FROM agg) {where}
+"""
+
+# Re-aggregate a handful of categories (drops the row once a category is empty)
+REFRESH_CATEGORIES_SQL = text(_AGGREGATE_SQL.format(where="AND category = ANY(:categories)"))
+
+# Full rebuild, run once at startup so the table matches existing data
+REBUILD_SQL = text(_AGGREGATE_SQL.format(where=""))
+
+
+class CategorySummaryService:
+    @staticmethod
+    async def product_added(db: AsyncSession, category: str, product_image: str, price) -> None:
+        """Fold a newly inserted product into its category row (same transaction as the insert)"""
+        if category is None:
+            return
+        await db.execute(LOCK_CATEGORIES_SQL, {"categories": [category]})
+        await db.execute(PRODUCT_ADDED_SQL, {"category": category, "product_image": product_image, "price": price})
+
+    @staticmethod
+    async def refresh(db: AsyncSession, categories: Iterable[str]) -> None:
+        """Re-aggregate the given categories after an update/delete has been flushed"""
+        categories = sorted({category for category in categories if category is not None})
+        if categories:
+            await db.execute(LOCK_CATEGORIES_SQL, {"categories": categories})
+            await db.execute(REFRESH_CATEGORIES_SQL, {"categories": categories})
@@ -0,0 +1,139 @@
+"""
+============================ Email Outbox ===============================
+Request handlers never talk to SMTP: they add a row to `email_outbox` inside
+their own transaction, so the mail exists if and only if the change committed.
+The `drain_email_outbox` beat task delivers due rows in batches over one
+authenticated SMTP session borrowed from the worker's SMTP pool:
+  1. claim: one short transaction marks up to OUTBOX_BATCH_SIZE due rows
+     'sending' with a lease (next_attempt_at = now + OUTBOX_LEASE_SECONDS) and
+     commits (FOR UPDATE SKIP LOCKED, so drainers can run side by side);
+  2. send: outside any transaction, no row locks held;
+  3. record: a second short transaction marks them sent, or pending again with
+     exponential backoff, or failed after OUTBOX_MAX_ATTEMPTS.
+A worker killed between 1 and 3 leaves its rows 'sending'; they are claimed
+again once the lease runs out, so a mail may rarely go out twice but is never lost.
+"""
+import smtplib
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from typing import Callable, ContextManager
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from eApp.config import CONFIG
+
+VERIFICATION_TEMPLATE = "verification.html"
+VERIFICATION_SUBJECT = "Email Verification."
+
+# errors that mean the SMTP session itself is unusable, as opposed to one bad mail
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(CONFIG.OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), CONFIG.OUTBOX_BACKOFF_MAX_SECONDS))
+
+
+def render_body(mail) -> str:
+    """Body of a claimed outbox row queued as template + context"""
+    from eApp.internal.email_templates import render
+    context = dict(mail.context or {})
+    if mail.template == VERIFICATION_TEMPLATE:
+        # the link token is minted here: the row was queued before the user id existed
+        from eApp.internal.tokens import create_verification_token
+        context["token"] = create_verification_token(SimpleNamespace(**context))
+    return render(mail.template, **context)
+
+
+# A lease that ran out means the worker died mid-batch. Every claim counts as an
+# attempt, so a mail that keeps killing its worker ends up failed, not claimed forever.
+EXPIRE_LEASES_SQL = text("""
+    UPDATE email_outbox
+    SET status = 'failed', last_error = 'lease expired'
+    WHERE status = 'sending' AND next_attempt_at <= :now AND attempts >= :max_attempts
+""")
+
+CLAIM_SQL = text("""
+    UPDATE email_outbox o
+    SET status = 'sending', attempts = o.attempts + 1, next_attempt_at = :lease_until
+    FROM (
+        SELECT id FROM email_outbox
+        WHERE status IN ('pending', 'sending') AND next_attempt_at <= :now
+        ORDER BY next_attempt_at
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    ) due
+    WHERE o.id = due.id
+    RETURNING o.id, o.recipients, o.subject, o.html_body, o.template, o.context, o.attempts
+""")
+
+# `status = 'sending'` guards against recording over a lease another drainer took over
+MARK_SENT_SQL = text("""
+    UPDATE email_outbox
+    SET status = 'sent', sent_at = :now, last_error = NULL
+    WHERE id = ANY(:ids) AND status = 'sending'
+""")
+
+MARK_FAILED_SQL = text("""
+    UPDATE email_outbox
+    SET status = :status, next_attempt_at = :next_attempt_at, last_error = :error
+    WHERE id = :id AND status = 'sending'
+""")
+
+
+class EmailOutboxService:
+    @staticmethod
+    def deliver_batch(session: Session, connect: Callable[[], ContextManager]) -> int:
+        """
+        Claim up to OUTBOX_BATCH_SIZE due mails, send them over one connection and
+        record the outcome (sync: runs inside the celery worker). `connect()`
+        yields an object with send(recipients, subject, html_body).
+        Returns:
+            Number of mails claimed
+        """
+        now = datetime.utcnow()
+        session.execute(EXPIRE_LEASES_SQL, {"now": now, "max_attempts": CONFIG.OUTBOX_MAX_ATTEMPTS})
+        batch = session.execute(CLAIM_SQL, {
+            "now": now,
+            "lease_until": now + timedelta(seconds=CONFIG.OUTBOX_LEASE_SECONDS),
+            "batch_size": CONFIG.OUTBOX_BATCH_SIZE,
+        }).all()
+        session.commit()
+        if not batch:
+            return 0
+
+        sent, failed = [], []
+        pending = list(batch)
+        try:
+            with connect() as connection:
+                while pending:
+                    mail = pending[0]
+                    try:
+                        connection.send(mail.recipients, mail.subject, mail.html_body or render_body(mail))
+                    except CONNECTION_ERRORS:
+                        # the session is gone: the rest of the batch fails below
+                        raise
+                    except Exception as e:
+                        failed.append(EmailOutboxService._failed(mail, e))
+                    else:
+                        sent.append(mail.id)
+                    pending.pop(0)
+        except Exception as e:
+            failed.extend(EmailOutboxService._failed(mail, e) for mail in pending)
+
+        if sent:
+            session.execute(MARK_SENT_SQL, {"ids": sent, "now": datetime.utcnow()})
+        if failed:
+            session.execute(MARK_FAILED_SQL, failed)
+        session.commit()
+        return len(batch)
+
+    @staticmethod
+    def _failed(mail, error: Exception) -> dict:
+        """Parameters for MARK_FAILED_SQL; `attempts` already counts this try (set by the claim)"""
+        retry = mail.attempts < CONFIG.OUTBOX_MAX_ATTEMPTS
+        return {
+            "id": mail.id,
+            "status": 'pending' if retry else 'failed',
+            "next_attempt_at": datetime.utcnow() + backoff(mail.attempts),
+            "error": str(error)[:1000],
+        }
+
@@ -0,0 +1,205 @@
+"""
+============================ Per-User Favourites ===============================
+`favourites` is the source of truth; the redis set `fav:<user_id>` (state db)
+mirrors it so listings can check membership for a whole page at once.
+Writes go to postgres first, then to the set (write-through). The set expires
+after CART_TTL_SECONDS without writes, like the cart hash.
+"""
+from typing import Iterable, List, Optional, Set
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis.exceptions import RedisError
+from eApp import models, schemas
+from eApp.config import CONFIG
+from eApp.redis_setup import redis_state
+from eApp.services.cart_service import CartService, LOADED_FIELD as CART_LOADED_FIELD, cart_key
+
+
+# One statement for a whole batch: the deletes and the inserts touch disjoint
+# product ids (the batch is collapsed to its last operation per product first),
+# and inserts skip ids that are not in products.
+APPLY_BATCH_SQL = text("""
+    WITH ops AS (
+        SELECT product_id, is_add
+        FROM unnest(CAST(:product_ids AS integer[]), CAST(:is_add AS boolean[])) AS o(product_id, is_add)
+    ), removed AS (
+        DELETE FROM favourites f
+        USING ops
+        WHERE f.user_id = :user_id AND f.product_id = ops.product_id AND NOT ops.is_add
+        RETURNING f.product_id
+    ), added AS (
+        INSERT INTO favourites (user_id, product_id, created_at)
+        SELECT :user_id, ops.product_id, now()
+        FROM ops
+        JOIN products p ON p.id = ops.product_id
+        WHERE ops.is_add
+        ON CONFLICT (user_id, product_id) DO NOTHING
+        RETURNING product_id
+    )
+    SELECT (SELECT count(*) FROM removed) AS removed, (SELECT count(*) FROM added) AS added
+""")
+
+# Flags for a page straight from postgres, used when redis is unavailable
+MEMBERSHIP_SQL = text("""
+    SELECT ids.product_id,
+           EXISTS (SELECT 1 FROM favourites f WHERE f.user_id = :user_id AND f.product_id = ids.product_id) AS is_favourite,
+           EXISTS (SELECT 1 FROM cart_items c WHERE c.user_id = :user_id AND c.product_id = ids.product_id) AS in_cart
+    FROM unnest(CAST(:product_ids AS integer[])) AS ids(product_id)
+""")
+
+# sentinel member: distinguishes "loaded and empty" from "not loaded"
+LOADED_MEMBER = "_loaded"
+
+# Fills an unloaded set. Does nothing if another request loaded it first, so an
+# add/remove applied in between is never overwritten. A set without the
+# sentinel (written to while evicted) is replaced.
+# ARGV: ttl, then the product ids.
+LOAD_LUA = """
+local key = KEYS[1]
+if redis.call('SISMEMBER', key, '_loaded') == 1 then
+    return 0
+end
+redis.call('DEL', key)
+redis.call('SADD', key, '_loaded')
+for i = 2, #ARGV, 1000 do
+    redis.call('SADD', key, unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+redis.call('EXPIRE', key, tonumber(ARGV[1]))
+return 1
+"""
+load_script = redis_state.register_script(LOAD_LUA)
+
+
+def fav_key(user_id: int) -> str:
+    return f"fav:{user_id}"
+
+
+class FavouriteService:
+    @staticmethod
+    async def _ensure_loaded(db: AsyncSession, user_id: int) -> None:
+        key = fav_key(user_id)
+        if await redis_state.sismember(key, LOADED_MEMBER):
+            return
+        result = await db.execute(select(models.Favourite.product_id).where(models.Favourite.user_id == user_id))
+        await load_script(keys=[key], args=[CONFIG.CART_TTL_SECONDS, *result.scalars().all()])
+
+    @staticmethod
+    async def get_ids(db: AsyncSession, user_id: int) -> Set[int]:
+        await FavouriteService._ensure_loaded(db, user_id)
+        members = await redis_state.smembers(fav_key(user_id))
+        return {int(member) for member in members if member != LOADED_MEMBER}
+
+    @staticmethod
+    async def add(db: AsyncSession, user_id: int, product_id: int) -> None:
+        await db.execute(
+            insert(models.Favourite)
+            .values(user_id=user_id, product_id=product_id)
+            .on_conflict_do_nothing(index_elements=["user_id", "product_id"])
+        )
+        await db.commit()
+        await FavouriteService._ensure_loaded(db, user_id)
+        pipe = redis_state.pipeline(transaction=True)
+        pipe.sadd(fav_key(user_id), str(product_id))
+        pipe.expire(fav_key(user_id), CONFIG.CART_TTL_SECONDS)
+        await pipe.execute()
+
+    @staticmethod
+    async def remove(db: AsyncSession, user_id: int, product_id: int) -> None:
+        await db.execute(
+            delete(models.Favourite).where(models.Favourite.user_id == user_id, models.Favourite.product_id == product_id)
+        )
+        await db.commit()
+        pipe = redis_state.pipeline(transaction=True)
+        pipe.srem(fav_key(user_id), str(product_id))
+        pipe.expire(fav_key(user_id), CONFIG.CART_TTL_SECONDS)
+        await pipe.execute()
+
+    @staticmethod
+    async def apply_batch(db: AsyncSession, user_id: int, operations: List[schemas.FavouriteOperation]) -> Set[int]:
+        """
+        Apply add/remove operations in one statement and one transaction.
+        Returns:
+            The resulting set of favourite product ids
+        """
+        # last operation per product wins, same as applying them one by one
+        final = {operation.product_id: operation.op == "add" for operation in operations}
+        await db.execute(APPLY_BATCH_SQL, {
+            "user_id": user_id,
+            "product_ids": list(final),
+            "is_add": list(final.values()),
+        })
+        await db.commit()
+
+        await FavouriteService._ensure_loaded(db, user_id)
+        added = [str(product_id) for product_id, is_add in final.items() if is_add]
+        removed = [str(product_id) for product_id, is_add in final.items() if not is_add]
+        pipe = redis_state.pipeline(transaction=True)
+        if added:
+            pipe.sadd(fav_key(user_id), *added)
+        if removed:
+            pipe.srem(fav_key(user_id), *removed)
+        pipe.expire(fav_key(user_id), CONFIG.CART_TTL_SECONDS)
+        pipe.smembers(fav_key(user_id))
+        members = (await pipe.execute())[-1]
+        return {int(member) for member in members if member != LOADED_MEMBER}
+
+    @staticmethod
+    async def annotate(
+        db: AsyncSession,
+        user_id: Optional[int],
+        documents: List[dict],
+        favourite_field: str = "is_favourite",
+        cart_field: str = "add_to_cart",
+        id_field: str = "id",
+    ) -> List[dict]:
+        """
+        Set the per-user favourite/cart flags on a page of product documents.
+        One redis round trip per page: SMISMEMBER on the favourites set and
+        HMGET on the cart hash (carts/favourites missing from redis are loaded once).
+        Anonymous callers get False for both flags. With redis down the flags come
+        from one postgres query instead (the cart as of its last write-behind).
+        """
+        ids = [str(document[id_field]) for document in documents]
+        if user_id is None or not ids:
+            for document in documents:
+                document[favourite_field] = False
+                document[cart_field] = False
+            return documents
+
+        try:
+            favourites, cart = await FavouriteService._membership(user_id, ids)
+            if favourites is None or cart is None:
+                await FavouriteService._ensure_loaded(db, user_id)
+                await CartService.ensure_loaded(db, user_id)
+                favourites, cart = await FavouriteService._membership(user_id, ids)
+        except RedisError as e:
+            print(f"Redis unavailable for favourite/cart flags, reading postgres: {e}")
+            favourites, cart = await FavouriteService._membership_from_db(db, user_id, ids)
+
+        for document, is_favourite, qty in zip(documents, favourites, cart):
+            document[favourite_field] = bool(is_favourite)
+            document[cart_field] = qty is not None
+        return documents
+
+    @staticmethod
+    async def _membership_from_db(db: AsyncSession, user_id: int, ids: List[str]):
+        """Same shape as _membership, read from favourites/cart_items"""
+        result = await db.execute(MEMBERSHIP_SQL, {"user_id": user_id, "product_ids": [int(i) for i in ids]})
+        flags = {row.product_id: (row.is_favourite, row.in_cart) for row in result}
+        favourites = [flags.get(int(i), (False, False))[0] for i in ids]
+        cart = [1 if flags.get(int(i), (False, False))[1] else None for i in ids]
+        return favourites, cart
+
+    @staticmethod
+    async def _membership(user_id: int, ids: Iterable[str]):
+        """(favourite flags, cart quantities) for ids; None for a structure not loaded in redis"""
+        ids = list(ids)
+        pipe = redis_state.pipeline(transaction=False)
+        pipe.smismember(fav_key(user_id), [LOADED_MEMBER] + ids)
+        pipe.hmget(cart_key(user_id), [CART_LOADED_FIELD] + ids)
+        favourites, cart = await pipe.execute()
+        return (
+            favourites[1:] if favourites[0] else None,
+            cart[1:] if cart[0] is not None else None,
+        )
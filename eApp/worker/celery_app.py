@@ -0,0 +1,33 @@
+"""
+Celery app for payment tasks. Kept free of database/engine setup so the API can
+import it to enqueue tasks by name (celery_app_payment.send_task); the tasks
+themselves live in celery_task_payment, which the worker and beat load.
+"""
+from celery import Celery
+from eApp.config import CONFIG
+
+# Celery app for payment tasks
+celery_app_payment = Celery(
+    "payment_email",
+    broker=CONFIG.REDIS_URL,  # Database 0: Celery Tasks (Queue)
+    backend=CONFIG.REDIS_CACHE_URL  # Database 2: Celery Results + App Cache
+)
+
+# Data serializer ip/op
+celery_app_payment.conf.update(
+    task_serializer='json',
+    accept_content=['json'],
+    result_serializer='json',
+    timezone='UTC',
+    enable_utc=True,
+    # Additional parameter for production
+    task_track_started=True,
+    task_time_limit=300,
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    worker_max_tasks_per_child=100,
+    broker_connection_retry_on_startup=True,
+    # for sending email we don't need to cache, delete cache after 5 mins:
+    result_expires=300,
+    result_backend_always_retry=True
+)
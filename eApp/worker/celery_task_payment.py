@@ -3,47 +3,29 @@ Celery worker for payment and subscription expiration checking
 """
 import datetime
 from typing import List
-from celery import Celery
 from sqlalchemy import text, create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import func
 from eApp.config import CONFIG
 from eApp.database import connection_string
 from eApp.models import Subscription, User
-from asgiref.sync import async_to_sync
-
-# Celery app for payment tasks
-celery_app_payment = Celery(
-    "payment_email",
-    broker=CONFIG.REDIS_URL,  # Database 0: Celery Tasks (Queue)
-    backend=CONFIG.REDIS_CACHE_URL  # Database 2: Celery Results + App Cache
-)
-
-# Data serializer ip/op
-celery_app_payment.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
-    timezone='UTC',
-    enable_utc=True,
-    # Additional parameter for production
-    task_track_started=True,
-    task_time_limit=300,
-    worker_prefetch_multiplier=1,
-    task_acks_late=True,
-    worker_max_tasks_per_child=100,
-    broker_connection_retry_on_startup=True,
-    # for sending email we don't need to cache, delete cache after 5 mins:
-    result_expires=300,
-    result_backend_always_retry=True
-)
+from celery.signals import worker_process_shutdown
+from eApp.worker.celery_app import celery_app_payment
 
 
 @celery_app_payment.task(name="send_email_task", ignore_result=True)
 def send_email_task(recip: List[str], sub: str, html: str):
-    """Send email task"""
-    from eApp.email_verification import send_html_email
-    async_to_sync(send_html_email)(recip, sub, html)
+    """Send email task: reuses a pooled, already logged-in SMTP session"""
+    from eApp.worker.smtp_pool import SMTP_POOL
+    with SMTP_POOL.connection() as connection:
+        connection.send(recip, sub, html)
+
+
+@worker_process_shutdown.connect
+def close_smtp_pool(**kwargs):
+    """Say QUIT on the pooled SMTP sessions instead of dropping them"""
+    from eApp.worker.smtp_pool import SMTP_POOL
+    SMTP_POOL.close_all()
 
 
 # <--------------Celery Beats---------------->
@@ -54,6 +36,22 @@ celery_app_payment.conf.beat_schedule = {
         'task': 'check_expired_subscriptions',
         'schedule': 30.0,  # After 30 seconds: scheduling after 30sec
     },
+    'refresh_product_ranking': {
+        'task': 'refresh_product_ranking',
+        'schedule': CONFIG.BEST_SELLING_REFRESH_SECONDS,
+    },
+    'sweep_expired_offers': {
+        'task': 'sweep_expired_offers',
+        'schedule': CONFIG.OFFER_SWEEP_INTERVAL_SECONDS,
+    },
+    'flush_carts': {
+        'task': 'flush_carts',
+        'schedule': CONFIG.CART_FLUSH_INTERVAL_SECONDS,
+    },
+    'drain_email_outbox': {
+        'task': 'drain_email_outbox',
+        'schedule': CONFIG.OUTBOX_DRAIN_INTERVAL_SECONDS,
+    },
 }
 
 # For celery we need synchronous database
@@ -99,6 +97,20 @@ def check_expired_subscriptions():
                     handle_single_subscription(session, sub_id, user_id, user_email, username)
                 
                 session.commit()
+                # paid_status changed: drop the cached principals of these users
+                from eApp.internal.principal_cache import publish_user_changed_sync
+                for _, user_id, _, _ in expire_subs:
+                    publish_user_changed_sync(user_id)
+
+                # all expiry mails of the batch are rendered in one pass, then sent
+                from eApp.internal.email_templates import render_many
+                bodies = render_many(
+                    "subscription_expired.html",
+                    [{"username": username} for _, _, _, username in expire_subs],
+                    shared={"subscription_expires_at": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")},
+                )
+                for (_, _, user_email, _), html in zip(expire_subs, bodies):
+                    send_email_task.delay([user_email], "Your Subscription has Expired", html)
                 print(f"successfully process expire_subscriptions_total_user: {len(expire_subs)}")
             except Exception as e:
                 print(f"couldn't check subscriptions status: {str(e)}")
@@ -107,11 +119,117 @@ def check_expired_subscriptions():
     _check_expired()
 
 
+@celery_app_payment.task(name="refresh_product_ranking", ignore_result=True)
+def refresh_product_ranking():
+    """Rebuild the aggregated best-selling ranking served by /bestSelling"""
+    from eApp.cache import invalidate_tags_sync
+    from eApp.services.best_selling_service import BestSellingService
+    with SyncSession() as session:
+        try:
+            ranked = BestSellingService.refresh_ranking(session)
+            invalidate_tags_sync("bestselling")
+            print(f"product ranking refreshed: {ranked} products ranked")
+        except Exception as e:
+            print(f"couldn't refresh product ranking: {str(e)}")
+            session.rollback()
+
+
+@celery_app_payment.task(name="flush_carts", ignore_result=True)
+def flush_carts():
+    """Write-behind: persist carts changed in redis since the last run into cart_items"""
+    from eApp.redis_setup import redis_state_sync
+    from eApp.services.cart_service import CartService
+    with SyncSession() as session:
+        try:
+            flushed = CartService.flush_dirty(session, redis_state_sync)
+            if flushed:
+                print(f"carts flushed: {flushed}")
+        except Exception as e:
+            print(f"couldn't flush carts: {str(e)}")
+
+
+@celery_app_payment.task(name="drain_email_outbox", ignore_result=True)
+def drain_email_outbox():
+    """
+    Deliver due email_outbox rows, one pooled SMTP session per batch. At most
+    OUTBOX_MAX_BATCHES_PER_RUN batches, so a run stays well inside task_time_limit;
+    a backlog is picked up by the next beat.
+    """
+    from eApp.services.email_outbox_service import EmailOutboxService
+    from eApp.worker.smtp_pool import SMTP_POOL
+    total = 0
+    with SyncSession() as session:
+        try:
+            for _ in range(CONFIG.OUTBOX_MAX_BATCHES_PER_RUN):
+                claimed = EmailOutboxService.deliver_batch(session, SMTP_POOL.connection)
+                total += claimed
+                if claimed < CONFIG.OUTBOX_BATCH_SIZE:
+                    break
+        except Exception as e:
+            print(f"couldn't drain email outbox: {str(e)}")
+            session.rollback()
+    if total:
+        print(f"email outbox: {total} mails processed")
+
+
+# Ends an expired offer: the product goes back to its original price and drops
+# out of idx_product_active_offer. Only offers the merchant gave a date are swept;
+# NULL means "no expiry". SKIP LOCKED lets two sweeps run side by side.
+SWEEP_EXPIRED_OFFERS_SQL = text("""
+    WITH expired AS (
+        SELECT id FROM products
+        WHERE offer_expiration_date IS NOT NULL
+          AND offer_expiration_date < current_date
+        ORDER BY offer_expiration_date
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE products p
+    SET new_price = p.original_price,
+        percentage_discount = 0,
+        offer_expiration_date = NULL
+    FROM expired
+    WHERE p.id = expired.id
+    RETURNING p.id, p.category, p.business_id
+""")
+
+
+@celery_app_payment.task(name="sweep_expired_offers", ignore_result=True)
+def sweep_expired_offers():
+    """Clear expired offers in batches so they never reach the read path"""
+    from eApp.cache import invalidate_tags_sync, product_tags
+    from eApp.services.category_summary_service import LOCK_CATEGORIES_SQL, REFRESH_CATEGORIES_SQL
+    total = 0
+    with SyncSession() as session:
+        while True:
+            try:
+                swept = session.execute(SWEEP_EXPIRED_OFFERS_SQL, {"batch_size": CONFIG.OFFER_SWEEP_BATCH_SIZE}).fetchall()
+                categories = sorted({category for _, category, _ in swept if category is not None})
+                if categories:
+                    session.execute(LOCK_CATEGORIES_SQL, {"categories": categories})
+                    session.execute(REFRESH_CATEGORIES_SQL, {"categories": categories})
+                session.commit()
+            except Exception as e:
+                print(f"couldn't sweep expired offers: {str(e)}")
+                session.rollback()
+                break
+
+            if swept:
+                tags = set(product_tags(None, categories))
+                for product_id, _, business_id in swept:
+                    tags.add(f"product:{product_id}")
+                    tags.add(f"business:{business_id}")
+                invalidate_tags_sync(*tags)
+            total += len(swept)
+            if len(swept) < CONFIG.OFFER_SWEEP_BATCH_SIZE:
+                break
+    print(f"expired offers swept: {total}")
+
+
 def handle_single_subscription(session, sub_id, user_id, user_email, username):
     """
     Handle single expired subscription:
     - Database update
-    - Email Sent
     """
     try:
         print(f"Processing subscription id:{sub_id} user id: {user_id}")
@@ -129,17 +247,7 @@ def handle_single_subscription(session, sub_id, user_id, user_email, username):
             SET paid_status = false 
             WHERE id = :user_id
         """), {'user_id': user_id})
-        
-        # Send email
-        from eApp.internal.html_templates import payment_subscription_expired
-        html = payment_subscription_expired(
-            subscription_expires_at=datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
-            username=username
-        )
-        
-        sub = "Your Subscription has Expired"
-        res = send_email_task.delay([user_email], sub, html)
-        print(f"Email task id: {res.id}, state: {res.state}")
+        # the expiry mail is sent by the caller once the batch has committed
         
     except Exception as e:
         print(f"Error processing subscription: {sub_id} error in {str(e)}")
@@ -0,0 +1,25 @@
+"""
+Plain smtplib building blocks for the celery workers (see smtp_pool.py).
+The only path that talks to the SMTP server.
+"""
+import ssl
+import smtplib
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import List
+from eApp.config import CONFIG
+
+
+def build_message(recipients: List[str], subject: str, html_body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((CONFIG.MAIL_FROM_NAME, CONFIG.MAIL_FROM))
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    message.set_content(html_body, subtype="html")
+    return message
+
+
+def open_smtp() -> smtplib.SMTP:
+    smtp = smtplib.SMTP_SSL(CONFIG.MAIL_SERVER, CONFIG.MAIL_PORT, context=ssl.create_default_context(), timeout=30)
+    smtp.login(CONFIG.MAIL_USERNAME, CONFIG.MAIL_PASSWORD.get_secret_value())
+    return smtp
@@ -0,0 +1,130 @@
+"""
+Worker-level SMTP connection pool. Authenticated SSL sessions are kept open across
+celery tasks, so a burst of mails (subscription expiry storms, outbox batches)
+pays the TLS handshake and login once per connection instead of once per mail.
+A connection is replaced after SMTP_MAX_MESSAGES_PER_CONNECTION mails or
+SMTP_MAX_IDLE_SECONDS idle; a send that finds the session dropped reconnects
+and retries once.
+Counters live in the redis hash `metrics:smtp` (shared by every worker process)
+and are shown by /metrics.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+from eApp.config import CONFIG
+from eApp.worker.mailer import build_message, open_smtp
+from eApp.services.email_outbox_service import CONNECTION_ERRORS
+
+METRICS_KEY = "metrics:smtp"
+
+
+def record(**values) -> None:
+    """Add to the shared smtp counters; metrics never break delivery"""
+    from eApp.redis_setup import redis_cache_sync
+    try:
+        pipe = redis_cache_sync.pipeline(transaction=False)
+        for field, value in values.items():
+            if isinstance(value, float):
+                pipe.hincrbyfloat(METRICS_KEY, field, value)
+            else:
+                pipe.hincrby(METRICS_KEY, field, value)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+class PooledConnection:
+    def __init__(self):
+        self.smtp = None
+        self.sent = 0
+        self.last_used = 0.0
+        self._open()
+
+    def _open(self) -> None:
+        started = time.perf_counter()
+        self.smtp = open_smtp()
+        self.sent = 0
+        self.last_used = time.monotonic()
+        record(connections_opened=1, connect_seconds=time.perf_counter() - started)
+
+    def reusable(self) -> bool:
+        return (self.sent < CONFIG.SMTP_MAX_MESSAGES_PER_CONNECTION
+                and time.monotonic() - self.last_used < CONFIG.SMTP_MAX_IDLE_SECONDS)
+
+    def send(self, recipients: List[str], subject: str, html_body: str) -> None:
+        message = build_message(recipients, subject, html_body)
+        started = time.perf_counter()
+        try:
+            try:
+                self.smtp.send_message(message)
+            except CONNECTION_ERRORS:
+                # the server dropped the idle session: reconnect and retry once
+                self.close()
+                record(reconnects=1)
+                self._open()
+                self.smtp.send_message(message)
+        except Exception:
+            record(send_failures=1)
+            raise
+        self.sent += 1
+        self.last_used = time.monotonic()
+        record(messages_sent=1, send_seconds=time.perf_counter() - started)
+
+    def close(self) -> None:
+        try:
+            self.smtp.quit()
+        except OSError:
+            self.smtp.close()
+
+
+class SMTPPool:
+    def __init__(self, size: int):
+        self.size = size
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: List[PooledConnection] = []
+        self._pid = os.getpid()
+
+    def _take_idle(self) -> Optional[PooledConnection]:
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked worker child: never share the parent's sockets
+                self._idle, self._pid = [], os.getpid()
+            while self._idle:
+                connection = self._idle.pop()
+                if connection.reusable():
+                    return connection
+                connection.close()
+        return None
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a logged-in connection (at most `size` at a time per process).
+        Yields an object with send(recipients, subject, html_body).
+        """
+        with self._slots:
+            connection = self._take_idle() or PooledConnection()
+            broken = False
+            try:
+                yield connection
+            except CONNECTION_ERRORS:
+                broken = True
+                raise
+            finally:
+                if broken:
+                    connection.close()
+                else:
+                    with self._lock:
+                        self._idle.append(connection)
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+SMTP_POOL = SMTPPool(CONFIG.SMTP_POOL_SIZE)